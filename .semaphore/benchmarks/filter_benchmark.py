@@ -0,0 +1,222 @@
+"""
+Micro-benchmarks for the filters of plugins/filter/filters.py
+
+Builds synthetic inventories of 3, 30 and 300 hosts in plaintext, mTLS, RBAC and OAuth variants and times the
+filters that run for every host of a play directly against the FilterModule class, without Ansible.
+Each case is timed cold, with the process-global filter caches cleared before every call, and warm, with the
+caches filled by previous calls. Results can be saved with --output and compared with --compare to a run
+made on the same machine, e.g. before a change. --filters-dir benchmarks the filters.py of another checkout,
+which is how CI compares a branch to its base branch on the same agent.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import timeit
+
+FILTERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'plugins', 'filter')
+
+# filters.py module being benchmarked, loaded by main
+filters_module = None
+
+INVENTORY_SIZES = (3, 30, 300)
+VARIANTS = ('plaintext', 'mtls', 'rbac', 'oauth')
+PRINCIPAL_MAPPING_RULES = 'RULE:^CN=([a-zA-Z0-9.-]*).*$/$1/L,RULE:^.*[Oo][Uu]=([a-zA-Z0-9.]*).*$/$1/,DEFAULT'
+
+
+def build_inventory(size, variant):
+    # Returns (groups, hostvars) of an inventory with size hosts split between brokers, connect and ksql groups
+    hosts = ['node-%03d.cluster.example.com' % index for index in range(size)]
+    hostvars = {}
+    for index, host in enumerate(hosts):
+        hostvars[host] = {
+            'inventory_hostname': host,
+            'hostname_aliasing_enabled': index % 2 == 0,
+            'ansible_host': '10.0.%d.%d' % (index // 250, index % 250) if index % 3 else 'fd00::%x' % (index + 1),
+            'kafka_connect_ssl_enabled': variant != 'plaintext',
+            'kafka_connect_oauth_enabled': variant == 'oauth',
+            'kafka_connect_group_id': 'connect-%d' % (index % 3),
+        }
+    third = max(1, size // 3)
+    groups = {
+        'kafka_broker': hosts[:third],
+        'kafka_connect': hosts[third:2 * third],
+        'kafka_connect_dc': hosts[2 * third:],
+        'ksql': hosts[2 * third:],
+    }
+    return groups, hostvars
+
+
+def build_listeners(variant):
+    # Returns a multi listener dictionary, with the security settings of the variant
+    sasl_protocol = {'plaintext': 'none', 'mtls': 'none', 'rbac': 'plain', 'oauth': 'oauth'}[variant]
+    listeners = {
+        'internal': {'name': 'INTERNAL', 'port': 9091},
+        'broker': {'name': 'BROKER', 'port': 9092, 'sasl_protocol': 'scram,plain'},
+        'external': {'name': 'EXTERNAL', 'port': 9093, 'hostname': 'kafka.example.com'},
+        'token': {'name': 'TOKEN', 'port': 9094, 'sasl_protocol': 'oauth' if variant == 'oauth' else 'plain'},
+    }
+    if variant == 'mtls':
+        for listener in listeners.values():
+            listener['ssl_client_authentication'] = 'required'
+            listener['ssl_mutual_auth_enabled'] = True
+    return listeners, variant != 'plaintext', sasl_protocol
+
+
+def build_properties_dict(size):
+    # Returns a properties dictionary shaped like the *_properties variables, one block per feature
+    properties_dict = {}
+    for block in range(40):
+        properties_dict['block_%d' % block] = {
+            'enabled': block % 4 != 0,
+            'properties': dict(('confluent.block%d.property%d' % (block, prop), prop * size) for prop in range(8)),
+        }
+    return properties_dict
+
+
+def build_cases(filters, size, variant):
+    # Returns a list of (case name, callable) for one inventory size and variant
+    groups, hostvars = build_inventory(size, variant)
+    listeners, ssl_enabled, sasl_protocol = build_listeners(variant)
+    rbac_enabled = variant == 'rbac'
+    oauth_enabled = variant == 'oauth'
+    properties_dict = build_properties_dict(size)
+    common_names = ['CN=%s,OU=Platform,O=Example' % host for host in groups['kafka_broker']]
+    all_hosts = list(hostvars)
+
+    def listener_properties():
+        return filters.listener_properties(
+            listeners, ssl_enabled, False, 'required' if variant == 'mtls' else 'none', PRINCIPAL_MAPPING_RULES, sasl_protocol,
+            '/var/ssl/truststore.jks', 'changeme', '/var/ssl/keystore.jks', 'changeme', 'changeme',
+            'plain_jaas', '/etc/kafka.keytab', 'kafka/host@REALM', 'kafka', 'admin', 'secret', 'admin', 'secret',
+            '/var/ssl/public.pem', oauth_enabled, 'https://idp/jwks', 'kafka', 'sub', rbac_enabled, False, False)
+
+    def client_properties():
+        return [filters.client_properties(
+            listener, ssl_enabled, False, variant == 'mtls', sasl_protocol, 'client.', '/var/ssl/truststore.jks', 'changeme',
+            False, '/var/ssl/keystore.jks', 'changeme', 'changeme', False, 'admin', 'secret', 'admin', 'secret', 'admin',
+            'secret', 'kafka', '/etc/kafka.keytab', 'kafka/host@REALM', False, 'client', 'secret', 'https://mds:8090',
+            oauth_enabled, 'super', 'secret', 'none', 'https://idp/token', False, False) for listener in listeners.values()]
+
+    def c3_connect_properties():
+        return filters.c3_connect_properties(
+            ['kafka_connect', 'kafka_connect_dc'], groups, hostvars, ssl_enabled, 'https', 8083, 'connect-cluster',
+            '/var/ssl/truststore.jks', 'changeme', '/var/ssl/keystore.jks', 'changeme', 'changeme',
+            oauth_enabled, rbac_enabled, 'client', 'secret', 'none', False)
+
+    def resolve_principal():
+        return [filters.resolve_principal(common_name, PRINCIPAL_MAPPING_RULES) for common_name in common_names]
+
+    def combine_properties():
+        return filters.combine_properties(properties_dict, {'custom.property': 'value'})
+
+    def resolve_and_format_hostnames():
+        return filters.resolve_and_format_hostnames(all_hosts, hostvars)
+
+    return [
+        ('listener_properties', listener_properties),
+        ('client_properties', client_properties),
+        ('c3_connect_properties', c3_connect_properties),
+        ('resolve_principal', resolve_principal),
+        ('combine_properties', combine_properties),
+        ('resolve_and_format_hostnames', resolve_and_format_hostnames),
+    ]
+
+
+def clear_filter_caches():
+    # Empties every process-global cache of the filters, so the next call runs the full code path
+    # Caches missing from the benchmarked filters.py, e.g. in an older checkout, are skipped
+    for cache_name in ('_HOSTNAME_INDEX', '_C3_GROUP_URLS', '_COMBINED_PROPERTIES', '_COMPILED_LISTENERS'):
+        if hasattr(filters_module, cache_name):
+            getattr(filters_module, cache_name).clear()
+    for cached_function_name in ('_compile_principal_mapping_rules', '_is_ipv6_address'):
+        if hasattr(filters_module, cached_function_name):
+            getattr(filters_module, cached_function_name).cache_clear()
+
+
+def load_filters(filters_dir):
+    # Imports the filters.py found in filters_dir as the module to benchmark
+    global filters_module
+    sys.path.insert(0, os.path.abspath(filters_dir))
+    filters_module = importlib.import_module('filters')
+
+
+def run_benchmarks(number, repeat, selected):
+    # Returns {case id: {'cold': best microseconds per call, 'warm': best microseconds per call}},
+    # case ids are <filter>/<size>/<variant>
+    filters = filters_module.FilterModule()
+    results = {}
+    for size in INVENTORY_SIZES:
+        for variant in VARIANTS:
+            for name, function in build_cases(filters, size, variant):
+                case_id = '%s/%d/%s' % (name, size, variant)
+                if selected and not any(pattern in case_id for pattern in selected):
+                    continue
+                # cold: one call per timing, each one after clearing the caches
+                cold_timings = timeit.repeat(function, setup=clear_filter_caches, number=1, repeat=number * repeat)
+                clear_filter_caches()
+                warm_timings = timeit.repeat(function, number=number, repeat=repeat)
+                results[case_id] = {
+                    'cold': round(min(cold_timings) * 1e6, 2),
+                    'warm': round(min(warm_timings) / number * 1e6, 2),
+                }
+    return results
+
+
+def compare(results, previous, tolerance):
+    # Prints both timings of every case next to the previous ones, returns the list of slowdowns
+    # as (case id, timing, previous, result)
+    slowdowns = []
+    print('%-50s %14s %14s %14s %14s' % ('case', 'cold', 'previous cold', 'warm', 'previous warm'))
+    for case_id, result in sorted(results.items()):
+        before = previous.get(case_id, {})
+        status = 'new' if not before else 'ok'
+        for timing in ('cold', 'warm'):
+            if timing in before and result[timing] > before[timing] * tolerance:
+                status = 'SLOWER'
+                slowdowns.append((case_id, timing, before[timing], result[timing]))
+        print('%-50s %11.2f us %14s %11.2f us %14s  %s' % (
+            case_id, result['cold'], '-' if 'cold' not in before else '%.2f us' % before['cold'],
+            result['warm'], '-' if 'warm' not in before else '%.2f us' % before['warm'], status))
+    return slowdowns
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('cases', nargs='*', help='Only run cases whose id contains one of these strings')
+    parser.add_argument('--number', type=int, default=20, help='Calls per timing (default: 20)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timings per case, the best one is kept (default: 5)')
+    parser.add_argument('--output', help='Save the results to this JSON file')
+    parser.add_argument('--compare', help='Compare to the results saved with --output by an earlier run on this machine')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='With --compare, exit with 1 when a timing is slower than the earlier one times this factor '
+                             '(default: 1.5)')
+    parser.add_argument('--filters-dir', default=FILTERS_DIR,
+                        help='Directory of the filters.py to benchmark (default: plugins/filter of this checkout)')
+    args = parser.parse_args(argv)
+
+    load_filters(args.filters_dir)
+
+    results = run_benchmarks(args.number, args.repeat, args.cases)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+            output_file.write('\n')
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as compare_file:
+            previous = json.load(compare_file)
+
+    slowdowns = compare(results, previous, args.tolerance)
+    if slowdowns:
+        print('\n%d timing(s) slower than %.1fx the earlier run' % (len(slowdowns), args.tolerance))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
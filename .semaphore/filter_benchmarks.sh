@@ -0,0 +1,26 @@
+# Compares the filter benchmarks of the PR branch to those of its base branch, both run on this agent
+# Timings depend on the machine, so the base branch is benchmarked in the same job instead of using stored baselines
+
+set -ex
+
+echo "Filter Benchmarks Block"
+echo "----------------"
+
+cd $PATH_TO_CPA
+
+if [[ -z "$SEMAPHORE_GIT_PR_BASE_BRANCH" ]]; then
+    echo "Skipping this block as it only runs for pull requests"
+    exit
+fi
+
+sem-version python 3.12
+
+BASE_CHECKOUT=$(mktemp -d)
+git fetch origin $SEMAPHORE_GIT_PR_BASE_BRANCH
+git worktree add $BASE_CHECKOUT FETCH_HEAD
+
+# The same benchmark script times both filters.py, the shared CI agents are noisier than a workstation
+python3 .semaphore/benchmarks/filter_benchmark.py --filters-dir $BASE_CHECKOUT/plugins/filter --output /tmp/filter_benchmark_base.json
+python3 .semaphore/benchmarks/filter_benchmark.py --compare /tmp/filter_benchmark_base.json --tolerance 2.0
+
+git worktree remove --force $BASE_CHECKOUT
@@ -13,6 +13,11 @@ DOCUMENTATION = '''
         - Skips support_bundle.yml itself to prevent recursion
         - Defaults to true (matches role default in confluent.platform.variables)
         - "Variable precedence: extra vars (-e) > inventory vars > default (true)"
+        - By default only the hosts that failed or were unreachable are collected from
+        - With support_bundle_auto_collect_async the collection runs detached in the background, the playbook
+          returns right away and the collection writes a PID file and a JSON status file to support_bundle_output_path
+        - "A background collection can be polled or awaited with:
+          python3 support_bundle_on_failure.py status|wait <status file>"
     options:
       support_bundle_auto_collect_on_failure:
         description: Enable automatic support bundle collection on failure
@@ -20,10 +25,37 @@ DOCUMENTATION = '''
         type: bool
         vars:
           - name: support_bundle_auto_collect_on_failure
+      support_bundle_auto_collect_failed_hosts_only:
+        description: Limit the automatic collection to the hosts that failed or were unreachable
+        default: True
+        type: bool
+        vars:
+          - name: support_bundle_auto_collect_failed_hosts_only
+      support_bundle_auto_collect_async:
+        description: Run the automatic collection detached in the background instead of blocking until it finishes
+        default: False
+        type: bool
+        vars:
+          - name: support_bundle_auto_collect_async
+      support_bundle_output_path:
+        description:
+          - Directory of the PID, status and log files of a background collection
+          - The callback reads the raw variable, a value holding a Jinja2 expression cannot be resolved and the
+            default directory is used for these files instead
+        default: "~/confluent-platform-support-bundles"
+        type: path
+        vars:
+          - name: support_bundle_output_path
 '''
 
+import argparse
+import json
 import os
 import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
 from ansible.plugins.callback import CallbackBase
 from ansible import constants as C
 from ansible import context
@@ -31,6 +63,85 @@ from ansible.utils.display import Display
 
 display = Display()
 
+PID_FILE_NAME = 'support_bundle_on_failure.pid'
+STATUS_FILE_NAME = 'support_bundle_on_failure.status.json'
+LOG_FILE_NAME = 'support_bundle_on_failure.log'
+FINAL_STATES = ('succeeded', 'failed')
+DEFAULT_OUTPUT_PATH = '~/confluent-platform-support-bundles'
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _write_atomically(path, text):
+    """Write text next to path then rename it, so readers never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.' + os.path.basename(path) + '.')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _write_json_atomically(path, content):
+    """Write JSON next to path then rename it, so pollers never read a partial status."""
+    _write_atomically(path, json.dumps(content, indent=2))
+
+
+def read_status(status_file):
+    """Status of a background collection, None when there is no status file."""
+    try:
+        with open(status_file) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def is_running(pid_file):
+    """PID of the background collection recorded in pid_file when that process is still alive, else None."""
+    try:
+        with open(pid_file) as f:
+            pid = int(f.read().strip())
+        os.kill(pid, 0)
+    except (IOError, OSError, ValueError):
+        return None
+    return pid
+
+
+def run_collection(status_file, pid_file, log_file, cwd, cmd):
+    """Run support_bundle.yml to completion and record its outcome, in the detached process."""
+    # The callback wrote a fresh 'starting' status before spawning this process
+    status = read_status(status_file) or dict(started=_now())
+    status.update(state='running', pid=os.getpid(), command=cmd, log=log_file)
+    _write_json_atomically(status_file, status)
+    try:
+        with open(log_file, 'w') as log:
+            rc = subprocess.call(cmd, cwd=cwd, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT)
+        status.update(state='succeeded' if rc == 0 else 'failed', rc=rc)
+    except Exception as e:
+        status.update(state='failed', rc=None, error=str(e))
+    status['finished'] = _now()
+    _write_json_atomically(status_file, status)
+    if is_running(pid_file) == os.getpid():
+        os.unlink(pid_file)
+    return 0 if status['state'] == 'succeeded' else 1
+
+
+def wait_for_collection(status_file, timeout=None, interval=5):
+    """Poll status_file until the collection is finished, returns the final status or None on timeout."""
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        status = read_status(status_file)
+        if status and status.get('state') in FINAL_STATES:
+            return status
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+        time.sleep(interval)
+
 
 class CallbackModule(CallbackBase):
     CALLBACK_VERSION = 2.0
@@ -58,19 +169,44 @@ class CallbackModule(CallbackBase):
         if self.playbook_name == 'support_bundle.yml':
             return
 
-        # Check if there were any failures
-        failed = any(
-            stats.summarize(h).get('failures', 0) > 0 or
-            stats.summarize(h).get('unreachable', 0) > 0
-            for h in stats.processed
-        )
+        # Check if there were any failures, and on which hosts
+        failed_hosts = []
+        for h in stats.processed:
+            summary = stats.summarize(h)
+            if summary.get('failures', 0) > 0 or summary.get('unreachable', 0) > 0:
+                failed_hosts.append(h)
 
-        if not failed:
+        if not failed_hosts:
             return
 
-        # Get variable value respecting Ansible's variable precedence
-        # Priority: extra vars (-e) > inventory vars > default (true)
-        auto_collect = True  # Default value
+        if not self._get_bool_setting('support_bundle_auto_collect_on_failure', True):
+            display.display("\nTo collect diagnostics: ansible-playbook support_bundle.yml", color=C.COLOR_HIGHLIGHT)
+            display.display("Or set: support_bundle_auto_collect_on_failure: true\n", color=C.COLOR_HIGHLIGHT)
+            return
+
+        limit_hosts = None
+        if self._get_bool_setting('support_bundle_auto_collect_failed_hosts_only', True):
+            limit_hosts = failed_hosts
+
+        if self._get_bool_setting('support_bundle_auto_collect_async', False):
+            self._collect_support_bundle_async(limit_hosts)
+        else:
+            self._collect_support_bundle(limit_hosts)
+
+    def _get_setting(self, name):
+        """
+        Raw value of a deployment-wide variable, None when it is not set.
+
+        Priority: extra vars (-e) > inventory 'all' group vars. Returns a tuple of
+        (value, from_extra_vars) so callers can apply the matching boolean parsing.
+        """
+        # Check for extra vars override (highest precedence)
+        if hasattr(context, 'CLIARGS') and context.CLIARGS:
+            extra_vars = context.CLIARGS.get('extra_vars', ())
+            for ev_str in (extra_vars if isinstance(extra_vars, tuple) else []):
+                if ev_str.startswith(name + '=') or (' ' + name + '=') in ev_str:
+                    value_str = ev_str.split(name + '=', 1)[1].split(' ', 1)[0]
+                    return value_str, True
 
         # Read from inventory 'all' group vars (deployment-wide setting)
         # We check 'all' group specifically because this is a deployment-wide setting
@@ -82,36 +218,30 @@ class CallbackModule(CallbackBase):
                 all_group = inventory.groups.get('all')
                 if all_group:
                     group_vars = all_group.get_vars()
-                    if 'support_bundle_auto_collect_on_failure' in group_vars:
-                        value = group_vars['support_bundle_auto_collect_on_failure']
-                        auto_collect = value in [True, 'true', 'True', 'yes', '1', 1]
+                    if name in group_vars:
+                        return group_vars[name], False
             except Exception as e:
                 display.vvv(f"Failed to read variable from inventory: {e}")
-                pass
-
-        # Check for extra vars override (highest precedence)
-        if hasattr(context, 'CLIARGS') and context.CLIARGS:
-            extra_vars = context.CLIARGS.get('extra_vars', ())
-            for ev_str in (extra_vars if isinstance(extra_vars, tuple) else []):
-                if 'support_bundle_auto_collect_on_failure=' in ev_str:
-                    value_str = ev_str.split('=', 1)[1].lower()
-                    auto_collect = value_str not in ('false', 'no', '0', 'off')
-                    break
 
-        if not auto_collect:
-            display.display("\nTo collect diagnostics: ansible-playbook support_bundle.yml", color=C.COLOR_HIGHLIGHT)
-            display.display("Or set: support_bundle_auto_collect_on_failure: true\n", color=C.COLOR_HIGHLIGHT)
-            return
+        return None, False
 
-        self._collect_support_bundle()
+    def _get_bool_setting(self, name, default):
+        # Get variable value respecting Ansible's variable precedence
+        # Priority: extra vars (-e) > inventory vars > default
+        value, from_extra_vars = self._get_setting(name)
+        if value is None:
+            return default
+        if from_extra_vars:
+            return value.lower() not in ('false', 'no', '0', 'off')
+        return value in [True, 'true', 'True', 'yes', '1', 1]
 
-    def _collect_support_bundle(self):
+    def _build_command(self, limit_hosts):
+        """ansible-playbook command line of support_bundle.yml, None when the playbook is missing."""
         support_bundle_playbook = os.path.join(self.playbook_dir, 'support_bundle.yml')
         if not os.path.exists(support_bundle_playbook):
             display.warning("support_bundle.yml not found at: %s" % support_bundle_playbook)
-            return
+            return None
 
-        collection_root = os.path.dirname(self.playbook_dir)
         cmd = ['ansible-playbook', support_bundle_playbook]
 
         # Get inventory and verbosity from CLIARGS
@@ -126,5 +256,108 @@ class CallbackModule(CallbackBase):
             if verbosity > 0:
                 cmd.append('-' + 'v' * verbosity)
 
+        if limit_hosts:
+            # support_bundle.yml also runs plays on the controller, keep localhost in the limit
+            cmd.extend(['--limit', ','.join(['localhost'] + [h for h in limit_hosts if h != 'localhost'])])
+
+        return cmd
+
+    def _collect_support_bundle(self, limit_hosts=None):
+        cmd = self._build_command(limit_hosts)
+        if cmd is None:
+            return
+
+        collection_root = os.path.dirname(self.playbook_dir)
         display.vvv("Executing: %s" % ' '.join(cmd))
         subprocess.run(cmd, cwd=collection_root, check=False)
+
+    def _collect_support_bundle_async(self, limit_hosts=None):
+        cmd = self._build_command(limit_hosts)
+        if cmd is None:
+            return
+
+        output_path, _ = self._get_setting('support_bundle_output_path')
+        if output_path and ('{{' in str(output_path) or '{%' in str(output_path)):
+            # Raw inventory values are not templated here, a literal '{{ ... }}' directory must not be created
+            display.warning("support_bundle_output_path %s is templated, the background collection files are written "
+                            "to %s instead" % (output_path, DEFAULT_OUTPUT_PATH))
+            output_path = None
+        output_path = os.path.abspath(os.path.expanduser(str(output_path or DEFAULT_OUTPUT_PATH)))
+        os.makedirs(output_path, exist_ok=True)
+        pid_file = os.path.join(output_path, PID_FILE_NAME)
+        status_file = os.path.join(output_path, STATUS_FILE_NAME)
+        log_file = os.path.join(output_path, LOG_FILE_NAME)
+
+        running_pid = is_running(pid_file)
+        if running_pid:
+            display.warning("A support bundle collection is already running (PID %s), status: %s" % (running_pid, status_file))
+            return
+
+        # Replace the status of any previous collection before spawning, so waiting never returns a stale outcome
+        _write_json_atomically(status_file, dict(
+            state='starting', hosts=limit_hosts, command=cmd, log=log_file, started=_now()))
+
+        collection_root = os.path.dirname(self.playbook_dir)
+        runner = [sys.executable, os.path.abspath(__file__), 'run',
+                  '--status-file', status_file, '--pid-file', pid_file, '--log-file', log_file,
+                  '--cwd', collection_root, '--'] + cmd
+        display.vvv("Executing in background: %s" % ' '.join(cmd))
+        # New session: the collection outlives this playbook and is not signalled with the operator's terminal
+        process = subprocess.Popen(runner, cwd=collection_root, stdin=subprocess.PIPE,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                   close_fds=True, start_new_session=True)
+
+        # The runner waits for its stdin to be closed before collecting, so the PID file is always written
+        # before the collection can finish and remove it
+        try:
+            _write_atomically(pid_file, "%d\n" % process.pid)
+        finally:
+            process.stdin.close()
+
+        display.display("\nCollecting support bundle in the background (PID %d)" % process.pid, color=C.COLOR_HIGHLIGHT)
+        display.display("Status: %s, log: %s" % (status_file, log_file), color=C.COLOR_HIGHLIGHT)
+        display.display("Wait for it: %s %s wait %s\n" % (sys.executable, os.path.abspath(__file__), status_file),
+                        color=C.COLOR_HIGHLIGHT)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run, poll or await a background support bundle collection.')
+    subparsers = parser.add_subparsers(dest='action', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Run support_bundle.yml and record its outcome (used by the callback)')
+    run_parser.add_argument('--status-file', required=True)
+    run_parser.add_argument('--pid-file', required=True)
+    run_parser.add_argument('--log-file', required=True)
+    run_parser.add_argument('--cwd', required=True)
+    run_parser.add_argument('cmd', nargs=argparse.REMAINDER)
+
+    status_parser = subparsers.add_parser('status', help='Print the status of a background collection')
+    status_parser.add_argument('status_file')
+
+    wait_parser = subparsers.add_parser('wait', help='Wait for a background collection to finish')
+    wait_parser.add_argument('status_file')
+    wait_parser.add_argument('--timeout', type=int, default=None, help='Seconds to wait, default forever')
+    wait_parser.add_argument('--interval', type=int, default=5, help='Seconds between polls')
+
+    args = parser.parse_args(argv)
+
+    if args.action == 'run':
+        cmd = args.cmd[1:] if args.cmd[:1] == ['--'] else args.cmd
+        # Released by the callback once it has recorded this PID
+        sys.stdin.read()
+        return run_collection(args.status_file, args.pid_file, args.log_file, args.cwd, cmd)
+
+    if args.action == 'status':
+        status = read_status(args.status_file)
+        print(json.dumps(status, indent=2))
+        return 0 if status else 2
+
+    status = wait_for_collection(args.status_file, args.timeout, args.interval)
+    print(json.dumps(status, indent=2))
+    if status is None:
+        return 2
+    return 0 if status['state'] == 'succeeded' else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
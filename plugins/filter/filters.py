@@ -1,7 +1,10 @@
+import json
 import re
 import ipaddress
 import hashlib
 import base64
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 DOCUMENTATION = '''
 ---
@@ -10,6 +13,96 @@ description: This plugin contains python functions which act as custom filters t
 '''
 
 
+@lru_cache(maxsize=64)
+def _compile_principal_mapping_rules(rules):
+    # Parses ssl.principal.mapping.rules once per distinct rules string into a tuple of
+    # (compiled pattern, replacement, case option) where case option is 'L', 'U' or None
+    compiled_rules = []
+    for rule_str in rules.split("RULE:"):
+        if not rule_str:
+            continue
+        mapping_pattern, mapping_value, *options = rule_str.split('/')
+        case = [option for option in options[0].split(',') if option] if options else []
+        compiled_rules.append((re.compile(mapping_pattern), mapping_value, case[0] if case else None))
+    return tuple(compiled_rules)
+
+
+@lru_cache(maxsize=4096)
+def _is_ipv6_address(address):
+    # Hostnames and IPv4 addresses never contain a colon, only those that do need to be parsed
+    if ':' not in address:
+        return False
+    try:
+        return isinstance(ipaddress.ip_address(address), ipaddress.IPv6Address)
+    except ValueError:
+        return False
+
+
+# Index of (inventory host, hostname_aliasing_enabled, hostname, ansible_host) -> (resolved hostname,
+# formatted hostname). It lives as long as the Ansible process templating the filters, keying on every value
+# the resolution reads keeps it correct when hostname or ansible_host change within a run, e.g. set_fact.
+_HOSTNAME_INDEX = {}
+
+# Control Center dependencies made of ansible groups of hosts, keyed by the name used in their
+# confluent.controlcenter.<name>.<id>.* properties. A group's id is the group_id_var of its first host,
+# or the ansible group name when the dependency has no group_id_var
+_C3_GROUP_DEPENDENCIES = {
+    'connect': {
+        'var_prefix': 'kafka_connect_',
+        'port_var': 'kafka_connect_rest_port',
+        'group_id_var': 'kafka_connect_group_id',
+        'url_key': 'cluster',
+        'advertised_url_key': None,
+        'advertised_hostname_var': None,
+        'stringify_passwords': False,
+    },
+    'ksql': {
+        'var_prefix': 'ksql_',
+        'port_var': 'ksql_listener_port',
+        'group_id_var': None,
+        'url_key': 'url',
+        'advertised_url_key': 'advertised.url',
+        'advertised_hostname_var': 'ksql_advertised_listener_hostname',
+        'stringify_passwords': True,
+    },
+}
+
+# Url lists of Control Center dependency groups, keyed by dependency, group hosts and defaults. It relies on
+# ssl and port settings of inventory hosts not changing within a run, and is cleared when full like the
+# combined properties
+_C3_GROUP_URLS = {}
+_C3_GROUP_URLS_MAX_ENTRIES = 64
+
+# Combined properties keyed by their enabled property blocks and custom properties. The cache is cleared
+# when full, a play usually combines a few dictionaries per component and host
+_COMBINED_PROPERTIES = {}
+_COMBINED_PROPERTIES_MAX_ENTRIES = 512
+
+# Compiled listeners dictionaries keyed by the JSON of the raw listeners and defaults. Like the combined
+# properties, the listeners variables are re-templated on every reference but rarely change within a run
+_COMPILED_LISTENERS = {}
+_COMPILED_LISTENERS_MAX_ENTRIES = 64
+
+# bcrypt hashes of basic auth users keyed by (principal, sha256 of the password, existing hash), so lazy
+# re-evaluations within a run neither rehash nor re-verify, and keep returning the same salt
+_BCRYPT_HASHES = {}
+_BCRYPT_MAX_WORKERS = 8
+
+
+def _bcrypt_hash_password(password, existing_hash):
+    # Returns existing_hash when the password still verifies against it, a hash with a fresh salt otherwise
+    import bcrypt
+    password_bytes = password.encode("utf-8")
+    if existing_hash:
+        try:
+            if bcrypt.checkpw(password_bytes, existing_hash.encode("utf-8")):
+                return existing_hash
+        except ValueError:
+            # Not a bcrypt hash
+            pass
+    return bcrypt.hashpw(password_bytes, bcrypt.gensalt()).decode()
+
+
 class FilterModule(object):
     def filters(self):
         return {
@@ -17,10 +110,13 @@ class FilterModule(object):
             'kafka_protocol_normalized': self.kafka_protocol_normalized,
             'kafka_protocol': self.kafka_protocol,
             'kafka_protocol_defaults': self.kafka_protocol_defaults,
+            'compile_listeners': self.compile_listeners,
             'get_sasl_mechanisms': self.get_sasl_mechanisms,
+            'unique_sasl_mechanisms': self.unique_sasl_mechanisms,
             'get_hostnames': self.get_hostnames,
             'split_to_list': self.split_to_list,
             'get_roles': self.get_roles,
+            'unique_roles': self.unique_roles,
             'resolve_hostname': self.resolve_hostname,
             'resolve_hostnames': self.resolve_hostnames,
             'cert_extension': self.cert_extension,
@@ -34,6 +130,7 @@ class FilterModule(object):
             'c3_connect_properties': self.c3_connect_properties,
             'c3_ksql_properties': self.c3_ksql_properties,
             'resolve_principal': self.resolve_principal,
+            'resolve_principals': self.resolve_principals,
             'is_ipv6': self.is_ipv6,
             'format_hostname': self.format_hostname,
             'resolve_and_format_hostname': self.resolve_and_format_hostname,
@@ -46,17 +143,36 @@ class FilterModule(object):
             'schema_registry_extension_classes': self.schema_registry_extension_classes,
         }
 
+    def _index_hostname(self, hosts_hostvars_dict):
+        # Resolves and formats the hostname of a node once, later lookups with the same inventory host,
+        # hostname_aliasing_enabled, hostname and ansible_host values are served from the index
+        inventory_hostname = hosts_hostvars_dict.get('inventory_hostname')
+        aliasing_enabled = hosts_hostvars_dict.get('hostname_aliasing_enabled') is True
+        if aliasing_enabled:
+            key = (inventory_hostname, True, hosts_hostvars_dict.get('hostname'), hosts_hostvars_dict.get('ansible_host'))
+        else:
+            key = (inventory_hostname, False, None, None)
+        entry = _HOSTNAME_INDEX.get(key)
+        if entry is None:
+            if aliasing_enabled:
+                hostname = hosts_hostvars_dict.get('hostname', hosts_hostvars_dict.get('ansible_host', inventory_hostname))
+            else:
+                hostname = inventory_hostname
+            entry = (hostname, self.format_hostname(hostname))
+            if inventory_hostname is not None:
+                _HOSTNAME_INDEX[key] = entry
+        return entry
+
     def resolve_and_format_hostname(self, hosts_hostvars_dict):
-        return self.format_hostname(self.resolve_hostname(hosts_hostvars_dict))
+        return self._index_hostname(hosts_hostvars_dict)[1]
 
     def resolve_and_format_hostnames(self, hosts, hostvars_dict):
-        hostnames = self.resolve_hostnames(hosts, hostvars_dict)
-        formatted_hostnames = []
-        for hostname in hostnames:
-            formatted_hostnames.append(self.format_hostname(hostname))
-        return formatted_hostnames
+        # Given a collection of hosts, usually from a group, will resolve and format the correct hostname to use for each.
+        return ["localhost" if host == "localhost" else self._index_hostname(hostvars_dict.get(host))[1] for host in hosts]
 
     def is_ipv6(self, address):
+        if isinstance(address, str):
+            return _is_ipv6_address(address)
         try:
             return isinstance(ipaddress.ip_address(address), ipaddress.IPv6Address)
         except ValueError:
@@ -116,53 +232,93 @@ class FilterModule(object):
 
     def kafka_protocol_defaults(self, listener, default_ssl_enabled, default_sasl_protocol):
         # Joins a sasl mechanism and tls setting and their default values, to return a kafka protocol
+        if 'kafka_protocol' in listener:
+            return listener['kafka_protocol']
         ssl_enabled = listener.get('ssl_enabled', default_ssl_enabled)
         sasl_protocol = listener.get('sasl_protocol', default_sasl_protocol)
         sasl_protocols_normalized = self.normalize_sasl_protocol(sasl_protocol)
         kafka_protocol = self.kafka_protocol_normalized(sasl_protocols_normalized, ssl_enabled)
         return kafka_protocol
 
+    def compile_listeners(self, listeners_dict, default_ssl_enabled, default_sasl_protocol, default_hostname=None):
+        # Normalizes every listener of a listeners dictionary once. Each compiled listener keeps its own keys with the
+        # ssl, mtls and sasl defaults applied, plus its normalized 'sasl_mechanisms' and 'kafka_protocol'.
+        # listener_properties, get_sasl_mechanisms, get_hostnames and ssl_required accept the compiled dictionary,
+        # client_properties accepts a single compiled listener, in place of the raw ones
+        # Results are cached on the raw listeners and defaults, so repeated lazy evaluations are not recompiled
+        try:
+            key = json.dumps([listeners_dict, default_ssl_enabled, default_sasl_protocol, default_hostname], sort_keys=True)
+        except TypeError:
+            # Values JSON cannot represent, compile without caching
+            key = None
+        compiled_listeners = _COMPILED_LISTENERS.get(key) if key is not None else None
+        if compiled_listeners is None:
+            compiled_listeners = self._compile_listeners(listeners_dict, default_ssl_enabled, default_sasl_protocol, default_hostname)
+            if key is not None:
+                if len(_COMPILED_LISTENERS) >= _COMPILED_LISTENERS_MAX_ENTRIES:
+                    _COMPILED_LISTENERS.clear()
+                _COMPILED_LISTENERS[key] = compiled_listeners
+        return dict((listener, dict(compiled_listener)) for listener, compiled_listener in compiled_listeners.items())
+
+    def _compile_listeners(self, listeners_dict, default_ssl_enabled, default_sasl_protocol, default_hostname):
+        compiled_listeners = {}
+        for listener in listeners_dict:
+            listener_dict = listeners_dict[listener]
+            ssl_enabled = listener_dict.get('ssl_enabled', default_ssl_enabled)
+            sasl_protocol = listener_dict.get('sasl_protocol', default_sasl_protocol)
+            sasl_mechanisms = self.normalize_sasl_protocol(sasl_protocol)
+
+            compiled_listener = dict(listener_dict)
+            compiled_listener['ssl_enabled'] = ssl_enabled
+            compiled_listener['sasl_protocol'] = sasl_protocol
+            compiled_listener['sasl_mechanisms'] = sasl_mechanisms
+            compiled_listener['kafka_protocol'] = self.kafka_protocol_normalized(sasl_mechanisms, ssl_enabled)
+            compiled_listener['ssl_mutual_auth_enabled'] = listener_dict.get('ssl_mutual_auth_enabled', False)
+            compiled_listener['ssl_client_authentication'] = listener_dict.get('ssl_client_authentication', 'none')
+            if default_hostname is not None:
+                compiled_listener['hostname'] = listener_dict.get('hostname', default_hostname)
+            compiled_listeners[listener] = compiled_listener
+        return compiled_listeners
+
+    def _listener_sasl_mechanisms(self, listener_dict, default_sasl_protocol):
+        # Compiled listeners already carry their normalized sasl mechanisms
+        if 'sasl_mechanisms' in listener_dict:
+            return listener_dict['sasl_mechanisms']
+        return self.normalize_sasl_protocol(listener_dict.get('sasl_protocol', default_sasl_protocol))
+
     def get_sasl_mechanisms(self, listeners_dict, default_sasl_protocol):
         # Loops over listeners dictionary and returns list of sasl mechanisms
         mechanisms = []
         for listener in listeners_dict:
-            sasl_protocol = listeners_dict[listener].get('sasl_protocol', default_sasl_protocol)
-            mechanisms = mechanisms + self.normalize_sasl_protocol(sasl_protocol)
+            mechanisms.extend(self._listener_sasl_mechanisms(listeners_dict[listener], default_sasl_protocol))
         return mechanisms
 
+    def unique_sasl_mechanisms(self, listeners_dict, default_sasl_protocol):
+        # Same as get_sasl_mechanisms, without duplicates and in order of first appearance
+        return list(dict.fromkeys(self.get_sasl_mechanisms(listeners_dict, default_sasl_protocol)))
+
     def get_hostnames(self, listeners_dict, default_hostname):
         # Loops over listeners dictionary and returns all hostnames attached to a listener
-        hostnames = []
-        for listener in listeners_dict:
-            hostname = listeners_dict[listener].get('hostname', default_hostname)
-            hostnames = hostnames + [hostname]
-        return hostnames
+        return [listeners_dict[listener].get('hostname', default_hostname) for listener in listeners_dict]
 
     def get_roles(self, basic_users_dict):
         # Loops over basic_users dictionary and returns all roles attached to each user
         roles = []
         for user in basic_users_dict:
-            user_roles = basic_users_dict[user].get('roles', 'admin').split(',')
-            roles = roles + user_roles
+            roles.extend(basic_users_dict[user].get('roles', 'admin').split(','))
         return roles
 
+    def unique_roles(self, basic_users_dict):
+        # Same as get_roles, without duplicates and in order of first appearance
+        return list(dict.fromkeys(self.get_roles(basic_users_dict)))
+
     def resolve_hostname(self, hosts_hostvars_dict):
         # Goes through selected possible VARs to provide the HOSTNAME for a given node for internal addressing within Confluent Platform
-        if hosts_hostvars_dict.get('hostname_aliasing_enabled') is True:
-            return hosts_hostvars_dict.get('hostname', hosts_hostvars_dict.get('ansible_host', hosts_hostvars_dict.get('inventory_hostname')))
-        else:
-            return hosts_hostvars_dict.get('inventory_hostname')
+        return self._index_hostname(hosts_hostvars_dict)[0]
 
     def resolve_hostnames(self, hosts, hostvars_dict):
         # Given a collection of hosts, usually from a group, will resolve the correct hostname to use for each.
-        hostnames = []
-        for host in hosts:
-            if host == "localhost":
-                hostnames.append("localhost")
-            else:
-                hostnames.append(self.resolve_hostname(hostvars_dict.get(host)))
-
-        return hostnames
+        return ["localhost" if host == "localhost" else self._index_hostname(hostvars_dict.get(host))[0] for host in hosts]
 
     def cert_extension(self, hostnames):
         # Joins a list of hostnames to be added to SAN of certificate
@@ -179,24 +335,40 @@ class FilterModule(object):
 
     def java_arg_build_out(self, java_arg_list):
         # Joins list of java args into string if arg is not the empty string
-        java_args = ''
-        for value in java_arg_list:
-            if value != '':
-                java_args = java_args + ' ' + value
-        return java_args[1:]
+        return ' '.join(value for value in java_arg_list if value != '')
 
-    def combine_properties(self, properties_dict):
+    def combine_properties(self, properties_dict, custom_properties=None):
         # Loops over master properties dictionary and combines sub elements if enabled
-        final_dict = {}
-        properties_tmp = {}
-
-        for prop in properties_dict:
-            if properties_dict[prop].get('enabled'):
-                for p in properties_dict[prop].get('properties'):
-                    properties_tmp[p] = str(properties_dict[prop].get('properties')[p])
-                final_dict.update(properties_tmp)
-                properties_tmp = {}
-        return final_dict
+        # custom_properties, when given, are merged last on top of the combined properties, as the combine filter does
+        # Results are cached on the enabled properties, so repeated lazy evaluations of the same dictionary are not rebuilt
+        enabled_blocks = tuple(
+            (prop, tuple(properties_dict[prop].get('properties').items()))
+            for prop in properties_dict if properties_dict[prop].get('enabled')
+        )
+        try:
+            # Value types are part of the key, True and 1 are equal but combine to different strings
+            key = (
+                tuple((p, type(value), value) for prop, properties in enabled_blocks for p, value in properties),
+                tuple((p, type(value), value) for p, value in custom_properties.items()) if custom_properties else ()
+            )
+            final_dict = _COMBINED_PROPERTIES.get(key)
+        except TypeError:
+            # Unhashable property values, combine without caching
+            key = None
+            final_dict = None
+
+        if final_dict is None:
+            final_dict = {}
+            for prop, properties in enabled_blocks:
+                for p, value in properties:
+                    final_dict[p] = str(value)
+            if custom_properties:
+                final_dict.update(custom_properties)
+            if key is not None:
+                if len(_COMBINED_PROPERTIES) >= _COMBINED_PROPERTIES_MAX_ENTRIES:
+                    _COMBINED_PROPERTIES.clear()
+                _COMBINED_PROPERTIES[key] = final_dict
+        return dict(final_dict)
 
     def split_to_dict(self, string):
         # Splits a string like key=val,key=val into dict
@@ -228,8 +400,7 @@ class FilterModule(object):
         final_dict = {}
         for listener in listeners_dict:
             listener_name = listeners_dict[listener].get('name').lower()
-            sasl_protocol = listeners_dict[listener].get('sasl_protocol', default_sasl_protocol)
-            normalize_sasl_protocols = self.normalize_sasl_protocol(sasl_protocol)
+            normalize_sasl_protocols = self._listener_sasl_mechanisms(listeners_dict[listener], default_sasl_protocol)
             final_dict['listener.name.' + listener_name + '.sasl.enabled.mechanisms'] = ','.join(normalize_sasl_protocols)
             if listeners_dict[listener].get('ssl_enabled', default_ssl_enabled):
                 final_dict['listener.name.' + listener_name + '.ssl.truststore.location'] = kafka_broker_truststore_path
@@ -412,8 +583,7 @@ class FilterModule(object):
             final_dict[config_prefix + 'ssl.keystore.type'] = 'BCFKS'
             final_dict[config_prefix + 'ssl.truststore.type'] = 'BCFKS'
 
-        sasl_protocols = listener_dict.get('sasl_protocol', default_sasl_protocol)
-        normalize_sasl_protocols = self.normalize_sasl_protocol(sasl_protocols)
+        normalize_sasl_protocols = self._listener_sasl_mechanisms(listener_dict, default_sasl_protocol)
         if normalize_sasl_protocols[0] == 'PLAIN' and not omit_jaas_configs:
             final_dict[config_prefix + 'sasl.mechanism'] = 'PLAIN'
             final_dict[config_prefix + 'sasl.jaas.config'] = 'org.apache.kafka.common.security.plain.PlainLoginModule required username=\"' +\
@@ -475,50 +645,89 @@ class FilterModule(object):
 
         return final_dict
 
+    def _c3_group_urls(self, dependency, hosts, hostvars, ssl_enabled, port):
+        # Builds the url list, and the advertised url list when the dependency has one, of a group of hosts once
+        # per group membership and defaults. Hostnames come from the hostname index
+        key = (dependency['var_prefix'], tuple(hosts), ssl_enabled, port)
+        entry = _C3_GROUP_URLS.get(key)
+        if entry is None:
+            ssl_var = dependency['var_prefix'] + 'ssl_enabled'
+            urls = []
+            advertised_urls = []
+            for host in hosts:
+                host_vars = hostvars[host]
+                protocol = 'https' if host_vars.get(ssl_var, ssl_enabled) else 'http'
+                hostname = self._index_hostname(host_vars)[1]
+                host_port = str(host_vars.get(dependency['port_var'], port))
+                urls.append('%s://%s:%s' % (protocol, hostname, host_port))
+                if dependency['advertised_url_key']:
+                    advertised_hostname = host_vars.get(dependency['advertised_hostname_var'], hostname)
+                    advertised_urls.append('%s://%s:%s' % (protocol, advertised_hostname, host_port))
+            entry = (','.join(urls), ','.join(advertised_urls))
+            if len(_C3_GROUP_URLS) >= _C3_GROUP_URLS_MAX_ENTRIES:
+                _C3_GROUP_URLS.clear()
+            _C3_GROUP_URLS[key] = entry
+        return entry
+
+    def _c3_group_properties(self, dependency_name, group_list, groups, hostvars, ssl_enabled, port, default_group_id,
+                             truststore_path, truststore_storepass, keystore_path, keystore_storepass, keystore_keypass,
+                             oauth_enabled, rbac_enabled, oauth_user, oauth_password, oauth_groups_scope, idp_self_signed):
+        # Generates the confluent.controlcenter.<dependency>.<id>.* properties of every ansible group of a dependency
+        # described in _C3_GROUP_DEPENDENCIES. The tls and oauth blocks are built once and shared by all groups
+        dependency = _C3_GROUP_DEPENDENCIES[dependency_name]
+        to_value = str if dependency['stringify_passwords'] else (lambda value: value)
+        ssl_block = (
+            ('ssl.truststore.location', truststore_path),
+            ('ssl.truststore.password', to_value(truststore_storepass)),
+            ('ssl.keystore.location', keystore_path),
+            ('ssl.keystore.password', to_value(keystore_storepass)),
+            ('ssl.key.password', to_value(keystore_keypass)),
+        )
+        oauth_block = [
+            ('oauthbearer.login.client.id', oauth_user),
+            ('oauthbearer.login.client.secret', oauth_password),
+        ]
+        if oauth_groups_scope != 'none':
+            oauth_block.append(('oauthbearer.login.oauth.scope', oauth_groups_scope))
+        if idp_self_signed:
+            oauth_block.append(('ssl.truststore.location', truststore_path))
+            oauth_block.append(('ssl.truststore.password', truststore_storepass))
+
+        final_dict = {}
+        for ansible_group in group_list:
+            # group lists default to the dependency's own group, but there may be scenario where no such group exists
+            if ansible_group in groups.keys() and len(groups[ansible_group]) > 0:
+                delegate_host = hostvars[groups[ansible_group][0]]
+                if dependency['group_id_var']:
+                    group_id = delegate_host.get(dependency['group_id_var'], default_group_id)
+                else:
+                    group_id = ansible_group
+                config_prefix = 'confluent.controlcenter.' + dependency_name + '.' + group_id + '.'
+
+                urls, advertised_urls = self._c3_group_urls(dependency, groups[ansible_group], hostvars, ssl_enabled, port)
+                final_dict[config_prefix + dependency['url_key']] = urls
+                if dependency['advertised_url_key']:
+                    final_dict[config_prefix + dependency['advertised_url_key']] = advertised_urls
+
+                if delegate_host.get(dependency['var_prefix'] + 'ssl_enabled', ssl_enabled):
+                    for suffix, value in ssl_block:
+                        final_dict[config_prefix + suffix] = value
+
+                if delegate_host.get(dependency['var_prefix'] + 'oauth_enabled', oauth_enabled) and not rbac_enabled:
+                    for suffix, value in oauth_block:
+                        final_dict[config_prefix + suffix] = value
+
+        return final_dict
+
     def c3_connect_properties(self, connect_group_list, groups, hostvars, ssl_enabled, http_protocol, port, default_connect_group_id,
                               truststore_path, truststore_storepass, keystore_path, keystore_storepass, keystore_keypass,
                               oauth_enabled, rbac_enabled, oauth_user, oauth_password, oauth_groups_scope, idp_self_signed):
         # For c3's connect properties, inputs a list of ansible groups of connect hosts, as well as their ssl settings
         # Outputs a properties dictionary with properties necessary to connect to each connect group
         # Other inputs help fill out the properties
-        final_dict = {}
-        for ansible_group in connect_group_list:
-            # connect_group_list defaults to ['kafka_connect'], but there may be scenario where no connect group exists
-            if ansible_group in groups.keys() and len(groups[ansible_group]) > 0:
-                delegate_host = hostvars[groups[ansible_group][0]]
-                group_id = delegate_host.get('kafka_connect_group_id', default_connect_group_id)
-
-                urls = []
-                for host in groups[ansible_group]:
-                    if hostvars[host].get('kafka_connect_ssl_enabled', ssl_enabled):
-                        protocol = 'https'
-                    else:
-                        protocol = 'http'
-                    urls.append(protocol + '://' +
-                                self.resolve_and_format_hostname(hostvars[host]) +
-                                ':' + str(hostvars[host].get('kafka_connect_rest_port', port)))
-
-                final_dict['confluent.controlcenter.connect.' + group_id + '.cluster'] = ','.join(urls)
-
-                if delegate_host.get('kafka_connect_ssl_enabled', ssl_enabled):
-                    final_dict['confluent.controlcenter.connect.' + group_id + '.ssl.truststore.location'] = truststore_path
-                    final_dict['confluent.controlcenter.connect.' + group_id + '.ssl.truststore.password'] = truststore_storepass
-                    final_dict['confluent.controlcenter.connect.' + group_id + '.ssl.keystore.location'] = keystore_path
-                    final_dict['confluent.controlcenter.connect.' + group_id + '.ssl.keystore.password'] = keystore_storepass
-                    final_dict['confluent.controlcenter.connect.' + group_id + '.ssl.key.password'] = keystore_keypass
-
-                if delegate_host.get('kafka_connect_oauth_enabled', oauth_enabled) and not rbac_enabled:
-                    final_dict['confluent.controlcenter.connect.' + group_id + '.oauthbearer.login.client.id'] = oauth_user
-                    final_dict['confluent.controlcenter.connect.' + group_id + '.oauthbearer.login.client.secret'] = oauth_password
-
-                if delegate_host.get('kafka_connect_oauth_enabled', oauth_enabled) and not rbac_enabled and oauth_groups_scope != 'none':
-                    final_dict['confluent.controlcenter.connect.' + group_id + '.oauthbearer.login.oauth.scope'] = oauth_groups_scope
-
-                if delegate_host.get('kafka_connect_oauth_enabled', oauth_enabled) and not rbac_enabled and idp_self_signed:
-                    final_dict['confluent.controlcenter.connect.' + group_id + '.ssl.truststore.location'] = truststore_path
-                    final_dict['confluent.controlcenter.connect.' + group_id + '.ssl.truststore.password'] = truststore_storepass
-
-        return final_dict
+        return self._c3_group_properties('connect', connect_group_list, groups, hostvars, ssl_enabled, port, default_connect_group_id,
+                                         truststore_path, truststore_storepass, keystore_path, keystore_storepass, keystore_keypass,
+                                         oauth_enabled, rbac_enabled, oauth_user, oauth_password, oauth_groups_scope, idp_self_signed)
 
     def c3_ksql_properties(self, ksql_group_list, groups, hostvars, ssl_enabled, http_protocol, port,
                            truststore_path, truststore_storepass, keystore_path, keystore_storepass, keystore_keypass,
@@ -526,49 +735,9 @@ class FilterModule(object):
         # For c3's ksql properties, inputs a list of ansible groups of ksql hosts, as well as their ssl settings
         # Outputs a properties dictionary with properties necessary to connect to each ksql group
         # Other inputs help fill out the properties
-        final_dict = {}
-        for ansible_group in ksql_group_list:
-            # ksql_group_list defaults to ['ksql'], but there may be scenario where no ksql group exists
-            if ansible_group in groups.keys() and len(groups[ansible_group]) > 0:
-                urls = []
-                advertised_urls = []
-                for host in groups[ansible_group]:
-                    if hostvars[host].get('ksql_ssl_enabled', ssl_enabled):
-                        protocol = 'https'
-                    else:
-                        protocol = 'http'
-                    urls.append(protocol + '://' + self.resolve_and_format_hostname(hostvars[host]) +
-                                ':' + str(hostvars[host].get('ksql_listener_port', port)))
-                    advertised_urls.append(
-                        protocol + '://' +
-                        hostvars[host].get('ksql_advertised_listener_hostname',
-                                           self.resolve_and_format_hostname(hostvars[host])) +
-                        ':' + str(hostvars[host].get('ksql_listener_port', port))
-                    )
-
-                final_dict['confluent.controlcenter.ksql.' + ansible_group + '.url'] = ','.join(urls)
-                final_dict['confluent.controlcenter.ksql.' + ansible_group + '.advertised.url'] = ','.join(advertised_urls)
-                delegate_host = hostvars[groups[ansible_group][0]]
-
-                if delegate_host.get('ksql_ssl_enabled', ssl_enabled):
-                    final_dict['confluent.controlcenter.ksql.' + ansible_group + '.ssl.truststore.location'] = truststore_path
-                    final_dict['confluent.controlcenter.ksql.' + ansible_group + '.ssl.truststore.password'] = str(truststore_storepass)
-                    final_dict['confluent.controlcenter.ksql.' + ansible_group + '.ssl.keystore.location'] = keystore_path
-                    final_dict['confluent.controlcenter.ksql.' + ansible_group + '.ssl.keystore.password'] = str(keystore_storepass)
-                    final_dict['confluent.controlcenter.ksql.' + ansible_group + '.ssl.key.password'] = str(keystore_keypass)
-
-                if delegate_host.get('ksql_oauth_enabled', oauth_enabled) and not rbac_enabled:
-                    final_dict['confluent.controlcenter.ksql.' + ansible_group + '.oauthbearer.login.client.id'] = oauth_user
-                    final_dict['confluent.controlcenter.ksql.' + ansible_group + '.oauthbearer.login.client.secret'] = oauth_password
-
-                if delegate_host.get('ksql_oauth_enabled', oauth_enabled) and not rbac_enabled and oauth_groups_scope != 'none':
-                    final_dict['confluent.controlcenter.ksql.' + ansible_group + '.oauthbearer.login.oauth.scope'] = oauth_groups_scope
-
-                if delegate_host.get('ksql_oauth_enabled', oauth_enabled) and not rbac_enabled and idp_self_signed:
-                    final_dict['confluent.controlcenter.ksql.' + ansible_group + '.ssl.truststore.location'] = truststore_path
-                    final_dict['confluent.controlcenter.ksql.' + ansible_group + '.ssl.truststore.password'] = truststore_storepass
-
-        return final_dict
+        return self._c3_group_properties('ksql', ksql_group_list, groups, hostvars, ssl_enabled, port, None,
+                                         truststore_path, truststore_storepass, keystore_path, keystore_storepass, keystore_keypass,
+                                         oauth_enabled, rbac_enabled, oauth_user, oauth_password, oauth_groups_scope, idp_self_signed)
 
     def resolve_principal(self, common_names: str, rules: str):
         """
@@ -594,15 +763,11 @@ class FilterModule(object):
         if rules == "DEFAULT":
             return principal_mapping_value
 
-        # Get all the rules and apply one by one on given Dname
-        list_of_rules = rules.split("RULE:")
-        list_of_rules = [i for i in list_of_rules if i]
-
-        for rule_str in list_of_rules:
-            mapping_pattern, mapping_value, *options = rule_str.split('/')
+        # Apply the compiled rules one by one on given Dname, remaining rules are ignored when match is found
+        for mapping_pattern, mapping_value, case in _compile_principal_mapping_rules(rules):
             for common_name in common_names:
-                matched = re.match(mapping_pattern, common_name)
-                if bool(matched):
+                matched = mapping_pattern.match(common_name)
+                if matched:
                     index = 1
                     for match_str in matched.groups():
                         mapping_value = mapping_value.replace(f"${index}", match_str)
@@ -610,27 +775,46 @@ class FilterModule(object):
 
                     # Remove leading and trailing whitespaces
                     mapping_value = mapping_value.strip()
-                    principal_mapping_value = mapping_value
-                    case = [option for option in options[0].split(',') if option]
-                    if case and case[0] == 'L':
-                        principal_mapping_value = mapping_value.lower()
-                    elif case and case[0] == 'U':
-                        principal_mapping_value = mapping_value.upper()
-                    break
-            if bool(matched):
-                # Remaining rules in the list are ignored when match is found
-                break
+                    if case == 'L':
+                        return mapping_value.lower()
+                    elif case == 'U':
+                        return mapping_value.upper()
+                    return mapping_value
         return principal_mapping_value
 
-    def c3_generate_salt_and_hash(self, users_dict):
-        import getpass
-        import bcrypt
+    def resolve_principals(self, common_names_list, rules: str):
+        """
+        Batch variant of resolve_principal, maps each entry of a list of common names strings with the same rules.
+        The rules are compiled once for the whole list.
+        """
+        return [self.resolve_principal(common_names, rules) for common_names in common_names_list]
+
+    def c3_generate_salt_and_hash(self, users_dict, existing_hashes=None):
+        # Returns principal -> bcrypt hash of the password for each user with a principal and a password
+        # existing_hashes maps principals to the hashes currently deployed, e.g. the basic_auth_users of a web config file.
+        # A hash is reused while the password still verifies against it, so unchanged users keep their salt and
+        # the file does not change. New hashes and verifications are computed in parallel
+        existing_hashes = existing_hashes or {}
         username_with_hashed_passwords = {}
+        pending = {}
         for user in users_dict:
-            if users_dict[user].get('principal') and users_dict[user].get('password'):
-                username_with_hashed_passwords[users_dict[user]['principal']] = bcrypt.hashpw(
-                    users_dict[user].get('password').encode("utf-8"), bcrypt.gensalt()
-                ).decode()
+            principal = users_dict[user].get('principal')
+            password = users_dict[user].get('password')
+            if principal and password:
+                existing_hash = existing_hashes.get(principal)
+                key = (principal, hashlib.sha256(password.encode("utf-8")).hexdigest(), existing_hash)
+                if key in _BCRYPT_HASHES:
+                    username_with_hashed_passwords[principal] = _BCRYPT_HASHES[key]
+                else:
+                    username_with_hashed_passwords[principal] = None
+                    pending[key] = (password, existing_hash)
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(_BCRYPT_MAX_WORKERS, len(pending))) as executor:
+                hashes = executor.map(lambda args: _bcrypt_hash_password(*args), pending.values())
+                for key, hashed_password in zip(pending, hashes):
+                    _BCRYPT_HASHES[key] = hashed_password
+                    username_with_hashed_passwords[key[0]] = hashed_password
         return username_with_hashed_passwords
 
     def _dependency_client_properties(self, config_prefix, ssl_enabled, truststore_path, truststore_storepass,
@@ -21,19 +21,51 @@ version_added: "2.9.0"
 description:
     - "This module allows setting up Kafka connectors from Ansible. It registers the new ones,
     updates the existing ones and removes the deleted ones."
+    - "Existing connectors that are paused get their configuration updated but are not restarted, they stay paused."
 
 options:
     connect_url:
         type: str
         description:
             - URL of the Connect REST server to use to add/edit connectors
-        required: true
+            - Required unless I(targets) is set
+        required: false
     active_connectors:
         type: list
         elements: dict
         description:
             - Dict of active connectors (each connector object must have a 'name' and a 'config' field)
-        required: true
+            - Required with I(connect_url)
+        required: false
+    targets:
+        type: list
+        elements: dict
+        description:
+            - List of Connect clusters to reconcile concurrently in a single module call, instead of I(connect_url)
+            - Results are returned per cluster in C(clusters)
+        required: false
+        suboptions:
+            connect_url:
+                type: str
+                description:
+                    - URL of the Connect REST server of this cluster
+                required: true
+            active_connectors:
+                type: list
+                elements: dict
+                description:
+                    - Dict of active connectors of this cluster
+                required: true
+            client_cert:
+                type: path
+                description:
+                    - Overrides I(client_cert) for this cluster
+                required: false
+            client_key:
+                type: path
+                description:
+                    - Overrides I(client_key) for this cluster
+                required: false
     timeout:
         type: int
         description:
@@ -55,6 +87,61 @@ options:
         description:
             - PEM formatted file that contains your private key to be used for SSL client authentication
         required: false
+    max_parallel:
+        type: int
+        description:
+            - Maximum number of connectors to create or update concurrently
+            - Connectors are reconciled one at a time when set to 1
+        required: false
+        default: 1
+    max_parallel_clusters:
+        type: int
+        description:
+            - Maximum number of clusters from I(targets) reconciled concurrently
+        required: false
+        default: 8
+    restart_batch_size:
+        type: int
+        description:
+            - Maximum number of connectors updated and restarted at the same time
+            - Updates are applied in waves of this size and the Connect group must have no unassigned or restarting
+              connector or task before the next wave starts
+            - Defaults to I(max_parallel)
+        required: false
+    restart_only_failed:
+        type: bool
+        description:
+            - Only restart the connector and task instances that have failed after a configuration update
+        required: false
+        default: false
+    status_initial_delay:
+        type: float
+        description:
+            - Seconds to wait after a create or update before the first connector status probe
+            - After a restart that the worker applies asynchronously, a RUNNING status is only trusted once the restart
+              was observed, or once this delay plus I(status_max_backoff) has elapsed
+        required: false
+        default: 2
+    status_max_backoff:
+        type: float
+        description:
+            - Upper bound in seconds of the jittered exponential backoff between connector status probes
+        required: false
+        default: 8
+    status_deadline:
+        type: float
+        description:
+            - Seconds after the first probe to wait for the connector and all its tasks to be RUNNING
+        required: false
+        default: 40
+    fingerprint_file:
+        type: path
+        description:
+            - Path of a JSON state file holding a hash of the configuration last deployed for each connector
+            - When set, connectors whose desired configuration hash is unchanged are skipped without comparing their live configuration
+            - Changes made to connectors outside of this module are not detected for skipped connectors
+            - Concurrent runs sharing the file serialize their updates on a lock file with the same path and a C(.lock) suffix
+        required: false
 
 author:
     - Laurent Domenech-Cabaud (@ldom)
@@ -65,6 +152,16 @@ EXAMPLES = '''
   connect_url: kafka_connect_http_protocol://0.0.0.0:kafka_connect_rest_port/connectors
   active_connectors: [{"name": "test-6-sink", "config": { .../... }}, {"name": "test-5-sink", "config": { .../... }}]
   timeout: 20
+  max_parallel: 10
+  fingerprint_file: /var/lib/kafka/connectors-fingerprints.json
+
+- name: Deploy connectors of several Connect clusters
+  targets:
+    - connect_url: https://connect-a:8083/connectors
+      active_connectors: [{"name": "test-6-sink", "config": { .../... }}]
+    - connect_url: https://connect-b:8083/connectors
+      active_connectors: [{"name": "test-5-sink", "config": { .../... }}]
+  max_parallel: 10
 '''
 
 RETURN = '''
@@ -72,19 +169,132 @@ message:
     description: The output message that the module generates
     type: str
     returned: always
+plan:
+    description:
+        - Connectors to create, update, delete or leave unchanged, computed from the current state of the Connect cluster
+        - In check mode the plan is returned without applying it
+        - In check mode an unreachable Connect REST server, e.g. on a fresh install, is planned as an empty cluster with a warning
+    type: dict
+    returned: when the Connect REST server could be queried, or in check mode when it is unreachable
+    contains:
+        create:
+            description: Names of the connectors that do not exist yet
+            type: list
+            elements: str
+        update:
+            description: Names of the connectors whose configuration differs
+            type: list
+            elements: str
+        delete:
+            description: Names of the existing connectors that are no longer active
+            type: list
+            elements: str
+        unchanged:
+            description: Names of the connectors already up to date
+            type: list
+            elements: str
+        config_diffs:
+            description: Per connector to update, the changed configuration keys with their before and after values
+            type: dict
+    sample:
+        create: [test-6-sink]
+        update: [test-5-sink]
+        delete: []
+        unchanged: []
+        config_diffs: {test-5-sink: {tasks.max: {before: '1', after: '2'}}}
+clusters:
+    description: Per cluster results when I(targets) is used, in the order of I(targets)
+    type: list
+    elements: dict
+    returned: when targets is set
+    contains:
+        connect_url:
+            description: URL of the Connect REST server of the cluster
+            type: str
+        changed:
+            description: Whether connectors of this cluster changed
+            type: bool
+        failed:
+            description: Whether an error occurred while reconciling this cluster
+            type: bool
+        message:
+            description: The output message for this cluster
+            type: str
+        plan:
+            description: Same as the top level I(plan), for this cluster
+            type: dict
+        metrics:
+            description: Same as the top level I(metrics), for this cluster
+            type: dict
+metrics:
+    description:
+        - Timings in seconds and counters of the Connect REST calls made by the module
+        - With I(targets), only the totals are returned here and the details are in each entry of C(clusters)
+    type: dict
+    returned: always
+    contains:
+        total_seconds:
+            description: Duration of the whole run
+            type: float
+        http_calls:
+            description: Number of HTTP requests sent to Connect
+            type: int
+        http_retries:
+            description:
+                - Number of requests resent after the worker closed an idle keep-alive connection
+                - Only requests that did not reach the worker, and GET requests, are resent
+            type: int
+        status_polls:
+            description: Number of connector status probes
+            type: int
+        phases:
+            description: Time spent taking the connectors snapshot, planning and waiting for the group to settle between restart waves
+            type: dict
+        connectors:
+            description: Per connector time spent in delete, create, config_get, put, restart and status_wait, and its HTTP call and status poll counts
+            type: dict
+    sample:
+        total_seconds: 4.21
+        http_calls: 6
+        http_retries: 0
+        status_polls: 2
+        phases: {snapshot_seconds: 0.08, plan_seconds: 0.0}
+        connectors: {test-5-sink: {http_calls: 3, status_polls: 1, put_seconds: 0.05, restart_seconds: 0.02, status_wait_seconds: 2.04}}
 '''
 
+import fcntl
+import hashlib
+import io
 import json
+import os
+import random
+import re
+import select
+import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.urls import open_url
+from ansible.module_utils.six.moves import http_client
+from ansible.module_utils.six.moves.urllib.parse import urlsplit
+from ansible.module_utils.six.moves.urllib.request import getproxies, proxy_bypass
 import ansible.module_utils.six.moves.urllib.error as urllib_error
 __metaclass__ = type
 
 RUNNING_STATE = "RUNNING"
-WAIT_TIME_BEFORE_GET_STATUS = 10  # seconds
-TIMEOUT_WAITING_FOR_TASK_STATUS = 30  # seconds
+PAUSED_STATE = "PAUSED"
+TRANSIENT_TASK_STATES = ("UNASSIGNED", "RESTARTING")
+STATUS_INITIAL_DELAY = 2  # seconds
+STATUS_BASE_BACKOFF = 0.5  # seconds
+STATUS_MAX_BACKOFF = 8  # seconds
+STATUS_DEADLINE = 40  # seconds
+CONNECTORS_EXPAND_QUERY = "expand=info&expand=status"
+IDEMPOTENT_METHODS = ('GET', 'HEAD')
+SENSITIVE_CONFIG_KEY = re.compile(r'password|secret|credentials|token|jaas', re.IGNORECASE)
+MASKED_CONFIG_VALUE = '********'
 
 
 def get_headers(token, headers=None):
@@ -102,52 +312,240 @@ def get_headers(token, headers=None):
     return headers
 
 
-def get_current_connectors(connect_url, timeout, token, client_cert, client_key):
+# an idle keep-alive socket becomes readable when the peer closed it
+def is_connection_dropped(sock):
     try:
-        res = open_url(
-            connect_url,
-            validate_certs=False,
-            timeout=timeout,
-            headers=get_headers(token),
-            client_cert=client_cert,
-            client_key=client_key
-        )
-        return json.loads(res.read())
+        return bool(select.select([sock], [], [], 0)[0])
+    except (OSError, ValueError):
+        return True
+
+
+class ConnectMetrics(object):
+    """
+    Timings and counters of one module run against a Connect cluster, safe to update from worker threads.
+
+    Phases timed with a connector name are reported per connector, along with the HTTP calls they issued.
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.counters = {'http_calls': 0, 'http_retries': 0, 'status_polls': 0}
+        self.phases = {}
+        self.connectors = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _get_connector_metrics(self, connector_name):
+        return self.connectors.setdefault(connector_name, {'http_calls': 0, 'status_polls': 0})
+
+    @contextmanager
+    def timed(self, phase, connector_name=None):
+        previous_connector_name = getattr(self._local, 'connector_name', None)
+        self._local.connector_name = connector_name or previous_connector_name
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            self._local.connector_name = previous_connector_name
+            key = phase + '_seconds'
+            with self._lock:
+                timings = self._get_connector_metrics(connector_name) if connector_name else self.phases
+                timings[key] = round(timings.get(key, 0) + elapsed, 3)
+
+    # counters are also attributed to the connector whose phase is being timed in the calling thread
+    def count(self, counter):
+        connector_name = getattr(self._local, 'connector_name', None)
+        with self._lock:
+            self.counters[counter] += 1
+            if connector_name and counter in ('http_calls', 'status_polls'):
+                self._get_connector_metrics(connector_name)[counter] += 1
+
+    def to_dict(self):
+        with self._lock:
+            metrics = dict(self.counters)
+            metrics['total_seconds'] = round(time.monotonic() - self.started_at, 3)
+            metrics['phases'] = dict(self.phases)
+            metrics['connectors'] = dict((name, dict(timings)) for name, timings in self.connectors.items())
+        return metrics
+
+
+class ConnectResponse(object):
+    """Fully read response of a Connect REST call, exposing the parts of the open_url response used here."""
+
+    def __init__(self, code, msg, body):
+        self.code = code
+        self.msg = msg
+        self.body = body
+
+    def getcode(self):
+        return self.code
+
+    def read(self):
+        return self.body
+
+
+class ConnectSession(object):
+    """
+    Keep-alive connections to the Connect REST endpoint, shared by every call of one module run.
+
+    Each worker thread keeps its own persistent connection so the TCP and TLS/mTLS handshakes happen once
+    per thread instead of once per request. When a proxy is configured for the endpoint, requests go
+    through open_url as before.
+    """
+
+    def __init__(self, connect_url, timeout, token, client_cert, client_key):
+        self.connect_url = connect_url
+        self.timeout = timeout
+        self.token = token
+        self.client_cert = client_cert
+        self.client_key = client_key
+
+        parsed_url = urlsplit(connect_url)
+        self.scheme = parsed_url.scheme
+        self.host = parsed_url.hostname
+        self.port = parsed_url.port
+        self.use_open_url = self.scheme in getproxies() and not proxy_bypass(self.host)
+
+        self.metrics = ConnectMetrics()
+        self._ssl_context = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def _get_ssl_context(self):
+        if self._ssl_context is None:
+            import ssl
+            # same as open_url(validate_certs=False)
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            if self.client_cert:
+                context.load_cert_chain(self.client_cert, self.client_key or None)
+            self._ssl_context = context
+        return self._ssl_context
+
+    def _get_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            if self.scheme == 'https':
+                connection = http_client.HTTPSConnection(self.host, self.port, timeout=self.timeout,
+                                                         context=self._get_ssl_context())
+            else:
+                connection = http_client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _reset_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    # raises urllib HTTPError on 4xx/5xx responses, like open_url
+    def request(self, url, method='GET', data=None, headers=None):
+        headers = get_headers(self.token, headers)
+        self.metrics.count('http_calls')
+        if self.use_open_url:
+            return open_url(
+                url,
+                method=method,
+                data=data,
+                headers=headers,
+                validate_certs=False,
+                timeout=self.timeout,
+                client_cert=self.client_cert,
+                client_key=self.client_key
+            )
+
+        parsed_url = urlsplit(url)
+        path = parsed_url.path + ('?' + parsed_url.query if parsed_url.query else '')
+        while True:
+            connection = self._get_connection()
+            if connection.sock is not None and is_connection_dropped(connection.sock):
+                # the worker closed the idle keep-alive connection, nothing was sent on it yet
+                self._reset_connection()
+                connection = self._get_connection()
+            reused = connection.sock is not None
+
+            try:
+                connection.request(method, path, body=data, headers=headers or {})
+            except (http_client.HTTPException, ConnectionError):
+                self._reset_connection()
+                # the request did not reach the worker, it is safe to resend it once on a fresh connection
+                if not reused:
+                    raise
+                self.metrics.count('http_retries')
+                continue
+
+            try:
+                res = connection.getresponse()
+                body = res.read()
+                break
+            except (http_client.HTTPException, ConnectionError):
+                self._reset_connection()
+                # the worker may already have applied the request, only idempotent ones are resent
+                if not reused or method not in IDEMPOTENT_METHODS:
+                    raise
+                self.metrics.count('http_retries')
+
+        if res.will_close:
+            self._reset_connection()
+
+        if res.status >= 400:
+            raise urllib_error.HTTPError(url, res.status, res.reason, res.msg, io.BytesIO(body))
+        return ConnectResponse(res.status, res.reason, body)
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+
+
+# returns a dict of connector name -> {'config': dict, 'state': str} fetched in a single round trip
+# the state tells which connectors are paused, those are updated without being restarted
+# Connect workers that do not support the expand parameter return the bare list of names instead,
+# in which case config and state are None and get fetched per connector
+def get_current_connectors(session):
+    try:
+        res = session.request("{}?{}".format(session.connect_url, CONNECTORS_EXPAND_QUERY))
+        connectors = json.loads(res.read())
     except urllib_error.HTTPError as e:
         if e.code != 404:
             raise
-        return []
-
-
-def remove_connector(connect_url, name, timeout, token, client_cert, client_key):
-    url = "{}/{}".format(connect_url, name)
-    r = open_url(
-        method='DELETE',
-        url=url,
-        validate_certs=False,
-        timeout=timeout,
-        headers=get_headers(token),
-        client_cert=client_cert,
-        client_key=client_key
-    )
+        return {}
+
+    if isinstance(connectors, list):
+        return dict((name, {'config': None, 'state': None}) for name in connectors)
+
+    current_connectors = {}
+    for name, expanded in connectors.items():
+        info = expanded.get('info') or {}
+        status = expanded.get('status') or {}
+        current_connectors[name] = {
+            'config': info.get('config'),
+            'state': status.get('connector', {}).get('state')
+        }
+    return current_connectors
+
+
+def remove_connector(session, name):
+    url = "{}/{}".format(session.connect_url, name)
+    with session.metrics.timed('delete', name):
+        r = session.request(url, method='DELETE')
     return r.getcode() == 200
 
 
 # return value: success (bool), changed (bool), message (str)
-def create_new_connector(connect_url, name, config, timeout, token, client_cert, client_key):
+def create_new_connector(session, name, config, status_wait=None):
     data = json.dumps({'name': name, 'config': config})
     headers = {'Content-Type': 'application/json'}
     try:
-        r = open_url(
-            method='POST',
-            url=connect_url,
-            data=data,
-            headers=get_headers(token, headers),
-            validate_certs=False,
-            timeout=timeout,
-            client_cert=client_cert,
-            client_key=client_key
-        )
+        with session.metrics.timed('create', name):
+            r = session.request(session.connect_url, method='POST', data=data, headers=headers)
     except urllib_error.HTTPError as e:
         message = "error while adding new connector configuration ({})".format(e)
         return False, False, message
@@ -156,7 +554,7 @@ def create_new_connector(connect_url, name, config, timeout, token, client_cert,
     changed = True
     message = "new connector added"
 
-    is_running, failures_msg = get_connector_status(connect_url, name, timeout, token, client_cert, client_key)
+    is_running, failures_msg = get_connector_status(session, name, **(status_wait or {}))
     if not is_running:
         success = False
         message = failures_msg
@@ -174,69 +572,43 @@ def truncate_error_message(message):
     return message[0:200]
 
 
+# delay before the n-th status retry: exponential growth capped at max_backoff, with equal jitter
+# so that many connectors restarted together do not poll the Connect worker in lockstep
+def status_backoff_delay(attempt, max_backoff):
+    delay = min(max_backoff, STATUS_BASE_BACKOFF * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
 # to be successful, the connector and all its tasks must be running
 # if anything fails, we fail and return the associated error messages
-def get_connector_status(connect_url, connector_name, timeout, token, client_cert, client_key):
-    time.sleep(WAIT_TIME_BEFORE_GET_STATUS)
-    status_url = "{}/{}/status".format(connect_url, connector_name)
-
-    time_waited = 0
-    try:
-        connector_status = 'awaiting'
-        while connector_status != RUNNING_STATE and time_waited < TIMEOUT_WAITING_FOR_TASK_STATUS:
-            # retry until the connector is running or timeout
-            res = open_url(
-                status_url,
-                validate_certs=False,
-                timeout=timeout,
-                headers=get_headers(token),
-                client_cert=client_cert,
-                client_key=client_key
-            )
+def get_connector_status(session, connector_name,
+                         initial_delay=STATUS_INITIAL_DELAY, max_backoff=STATUS_MAX_BACKOFF, deadline=STATUS_DEADLINE,
+                         restart_pending=False):
+    with session.metrics.timed('status_wait', connector_name):
+        return wait_for_connector_status(session, connector_name, initial_delay, max_backoff, deadline, restart_pending)
+
+
+# after an asynchronous restart, the status store may still hold the RUNNING state from before the restart,
+# so RUNNING is only accepted once an UNASSIGNED or RESTARTING state was seen, or once it has been reported
+# for max_backoff seconds past the initial delay, long enough for the worker to have recorded the restart
+def wait_for_connector_status(session, connector_name, initial_delay, max_backoff, deadline, restart_pending=False):
+    restarted_at = time.monotonic()
+    time.sleep(initial_delay)
+    status_url = "{}/{}/status".format(session.connect_url, connector_name)
+    expires_at = time.monotonic() + deadline
+    restart_seen = not restart_pending
+
+    attempt = 0
+    while True:
+        try:
+            session.metrics.count('status_polls')
+            res = session.request(status_url)
             current_status = json.loads(res.read())
 
             connector_status = current_status['connector']['state']
+            tasks = current_status['tasks']
+            tasks_settled = bool(tasks) and all(task['state'] not in TRANSIENT_TASK_STATES for task in tasks)
 
-            if connector_status != RUNNING_STATE:
-                time_waited += 1
-                time.sleep(1)
-
-        if connector_status != RUNNING_STATE:
-            return False, "Connector state paused or failed"
-
-        nb_tasks = len(current_status['tasks'])
-
-    except urllib_error.HTTPError as e:
-        message = "Error while getting status of connector ({})".format(e)
-        return False, message
-    except json.JSONDecodeError as e:
-        message = "JSON decode error while parsing connector status: ({})".format(e)
-        return False, message
-    except KeyError as e:
-        message = "Key error while accessing connector state: ({})".format(e)
-        return False, message
-    except Exception as e:
-        message = "Unexpected error while getting status of connector: ({})".format(e)
-        return False, message
-
-    failures = []
-    while not nb_tasks:
-        time_waited += 1
-        time.sleep(1)
-        if time_waited > TIMEOUT_WAITING_FOR_TASK_STATUS:
-            return False, "timeout getting task status"
-
-        try:
-            res = open_url(
-                status_url,
-                validate_certs=False,
-                timeout=timeout,
-                headers=get_headers(token),
-                client_cert=client_cert,
-                client_key=client_key
-            )
-            current_status = json.loads(res.read())
-            nb_tasks = len(current_status['tasks'])
         except urllib_error.HTTPError as e:
             message = "Error while getting status of connector ({})".format(e)
             return False, message
@@ -250,7 +622,27 @@ def get_connector_status(connect_url, connector_name, timeout, token, client_cer
             message = "Unexpected error while getting status of connector: ({})".format(e)
             return False, message
 
-    for task in current_status['tasks']:
+        if connector_status in TRANSIENT_TASK_STATES or not tasks_settled:
+            restart_seen = True
+
+        if connector_status == RUNNING_STATE and tasks_settled and \
+                (restart_seen or time.monotonic() - restarted_at >= initial_delay + max_backoff):
+            break
+
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            if connector_status != RUNNING_STATE:
+                return False, "Connector state paused or failed"
+            if not tasks:
+                return False, "timeout getting task status"
+            # tasks still unassigned or restarting, report them as failures below
+            break
+
+        time.sleep(min(status_backoff_delay(attempt, max_backoff), remaining))
+        attempt += 1
+
+    failures = []
+    for task in tasks:
         if task['state'] != RUNNING_STATE:
             no_trace_error_msg = 'No trace in api response. task[\'state\']: {}'.format(task['state'])
             failures.append("task {}: {}".format(task['id'], truncate_error_message(task.get('trace', no_trace_error_msg))))
@@ -261,26 +653,28 @@ def get_connector_status(connect_url, connector_name, timeout, token, client_cer
     return True, None
 
 
-# return value: success (bool), changed (bool), message (str)
-def update_existing_connector(connect_url, name, config, timeout, token, client_cert, client_key):
-    url = "{}/{}/config".format(connect_url, name)
-    restart_url = "{}/{}/restart".format(connect_url, name)
-
-    res = open_url(
-        url,
-        validate_certs=False,
-        timeout=timeout,
-        headers=get_headers(token),
-        client_cert=client_cert,
-        client_key=client_key
-    )
-    current_config = json.loads(res.read())
+# restarts the connector together with its tasks, or only its failed instances when only_failed is set
+# workers that predate these query parameters ignore them and restart the connector instance only
+# return value: success (bool), message (str), pending (bool): whether the restart happens after the call returned
+def restart_connector(session, name, only_failed=False):
+    restart_url = "{}/{}/restart?includeTasks=true&onlyFailed={}".format(
+        session.connect_url, name, 'true' if only_failed else 'false')
+    try:
+        with session.metrics.timed('restart', name):
+            r = session.request(restart_url, method='POST')
+        code, msg = r.getcode(), r.msg
+    except urllib_error.HTTPError as e:
+        code, msg = e.code, e.msg
+
+    # 202: the restart was accepted and is applied asynchronously
+    # 409: a rebalance is in progress, the connector gets restarted with it
+    return code in (200, 202, 204, 409), msg, code in (202, 409)
 
-    existing_config = config.copy()
-    existing_config.update({'name': name})
 
-    if all(current_config.get(k) == v for k, v in existing_config.items()):
-        return True, False, "no configuration change"
+# a paused connector keeps its target state across the update and restarts: it is neither restarted nor waited for
+# return value: success (bool), changed (bool), message (str)
+def update_existing_connector(session, name, config, status_wait=None, only_failed=False, paused=False):
+    url = "{}/{}/config".format(session.connect_url, name)
 
     success = True
     message = ""
@@ -291,16 +685,8 @@ def update_existing_connector(connect_url, name, config, timeout, token, client_
     headers = {'Content-Type': 'application/json'}
     r = None
     try:
-        r = open_url(
-            method='PUT',
-            url=url,
-            data=data,
-            headers=get_headers(token, headers),
-            validate_certs=False,
-            timeout=timeout,
-            client_cert=client_cert,
-            client_key=client_key
-        )
+        with session.metrics.timed('put', name):
+            r = session.request(url, method='PUT', data=data, headers=headers)
     except urllib_error.HTTPError as e:
         message = "error while updating configuration ({})".format(e)
         success = False
@@ -313,29 +699,18 @@ def update_existing_connector(connect_url, name, config, timeout, token, client_
     # configuration was updated, let's restart the connector
 
     message = "connector configuration updated"
-    success = True
-    try:
-        r = open_url(
-            method='POST',
-            url=restart_url,
-            validate_certs=False,
-            timeout=timeout,
-            headers=get_headers(token),
-            client_cert=client_cert,
-            client_key=client_key
-        )
-    except urllib_error.HTTPError:
-        pass
-    finally:
-        if r.getcode() not in (200, 204, 409):
-            success = False
-            message = "connector configuration updated but failed to restart " \
-                      "after a configuration update. {}".format(r.msg)
+    if paused:
+        return success, changed, message + ", connector is paused"
+
+    restarted, restart_msg, restart_pending = restart_connector(session, name, only_failed)
+    if not restarted:
+        success = False
+        message = "connector configuration updated but failed to restart " \
+                  "after a configuration update. {}".format(restart_msg)
 
     # get the connector's status
     # if failed, return it
-    # if there's a rebalance, wait for it to finish? how?
-    is_running, failures_msg = get_connector_status(connect_url, name, timeout, token, client_cert, client_key)
+    is_running, failures_msg = get_connector_status(session, name, restart_pending=restart_pending, **(status_wait or {}))
     if not is_running:
         success = False
         message = failures_msg
@@ -343,6 +718,186 @@ def update_existing_connector(connect_url, name, config, timeout, token, client_
     return success, changed, message
 
 
+def is_status_settled(status):
+    if status.get('connector', {}).get('state') in TRANSIENT_TASK_STATES:
+        return False
+    return all(task.get('state') not in TRANSIENT_TASK_STATES for task in status.get('tasks', []))
+
+
+# waits until no connector or task of the Connect group is unassigned or restarting, i.e. the rebalance is over
+# returns False if the group did not settle before the deadline, True otherwise
+def wait_for_group_settled(session, max_backoff=STATUS_MAX_BACKOFF, deadline=STATUS_DEADLINE):
+    with session.metrics.timed('group_settle'):
+        return poll_group_settled(session, max_backoff, deadline)
+
+
+def poll_group_settled(session, max_backoff, deadline):
+    expires_at = time.monotonic() + deadline
+
+    attempt = 0
+    while True:
+        try:
+            res = session.request("{}?expand=status".format(session.connect_url))
+            connectors = json.loads(res.read())
+        except (urllib_error.URLError, http_client.HTTPException, OSError, ValueError):
+            # workers answer errors or time out while the group rebalances, it is not settled yet
+            connectors = None
+
+        if isinstance(connectors, list):
+            # no expand support, the group state cannot be observed in one call
+            return True
+
+        if connectors is not None and \
+                all(is_status_settled(expanded.get('status') or {}) for expanded in connectors.values()):
+            return True
+
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            return False
+
+        time.sleep(min(status_backoff_delay(attempt, max_backoff), remaining))
+        attempt += 1
+
+
+# every config update restarts the connector and triggers a rebalance of the group, so updates are applied
+# in waves of batch_size connectors and the group must settle before the next wave starts
+# if it does not settle before the deadline, the remaining connectors are not updated and reported as failed
+# current_states maps connector names to their state in the connectors snapshot, if known
+# return value: dict of connector name -> (success, changed, message)
+def schedule_updates(session, connectors, batch_size, status_wait, only_failed=False, current_states=None):
+    def update(connector):
+        return update_existing_connector(
+            session=session,
+            name=connector['name'],
+            config=connector['config'],
+            status_wait=status_wait,
+            only_failed=only_failed,
+            paused=(current_states or {}).get(connector['name']) == PAUSED_STATE
+        )
+
+    results = {}
+    for wave_start in range(0, len(connectors), batch_size):
+        if wave_start and not wait_for_group_settled(session, status_wait['max_backoff'], status_wait['deadline']):
+            message = "not updated, the Connect group did not settle within {}s after the previous restart wave".format(
+                status_wait['deadline'])
+            results.update((connector['name'], (False, False, message)) for connector in connectors[wave_start:])
+            break
+
+        wave = connectors[wave_start:wave_start + batch_size]
+        with ThreadPoolExecutor(max_workers=len(wave)) as executor:
+            results.update(zip((connector['name'] for connector in wave), executor.map(update, wave)))
+
+    return results
+
+
+def get_connector_config(session, name):
+    with session.metrics.timed('config_get', name):
+        res = session.request("{}/{}/config".format(session.connect_url, name))
+    return json.loads(res.read())
+
+
+# only the desired keys are compared, extra keys set on the worker side are ignored
+def get_config_diff(name, config, current_config):
+    desired_config = config.copy()
+    desired_config.update({'name': name})
+
+    config_diff = {}
+    for key, value in desired_config.items():
+        if current_config.get(key) != value:
+            if SENSITIVE_CONFIG_KEY.search(key):
+                config_diff[key] = {'before': MASKED_CONFIG_VALUE, 'after': MASKED_CONFIG_VALUE}
+            else:
+                config_diff[key] = {'before': current_config.get(key), 'after': value}
+    return config_diff
+
+
+def get_config_fingerprint(name, config):
+    desired_config = config.copy()
+    desired_config.update({'name': name})
+    return hashlib.sha256(json.dumps(desired_config, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+# the fingerprint file maps each connect_url to a dict of connector name -> fingerprint
+def load_fingerprints(fingerprint_file):
+    if not fingerprint_file or not os.path.exists(fingerprint_file):
+        return {}
+    try:
+        with open(fingerprint_file, 'r') as f:
+            return json.load(f)
+    except ValueError:
+        # corrupted state only means every connector gets compared again
+        return {}
+
+
+# several hosts or plays may deploy connectors at the same time with the same file,
+# the lock held on a sidecar file serializes their read-modify-write
+@contextmanager
+def fingerprint_file_lock(fingerprint_file):
+    fingerprint_dir = os.path.dirname(os.path.abspath(fingerprint_file))
+    if not os.path.isdir(fingerprint_dir):
+        os.makedirs(fingerprint_dir)
+    with open(fingerprint_file + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# updates maps the connect_url of each reconciled cluster to its fingerprints, they are merged into the
+# current content of the file so that clusters saved by another run in the meantime are kept
+def save_fingerprints(fingerprint_file, updates):
+    with fingerprint_file_lock(fingerprint_file):
+        fingerprints = load_fingerprints(fingerprint_file)
+        fingerprints.update(updates)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(fingerprint_file)),
+                                        prefix='.connectors-fingerprints')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(fingerprints, f, indent=2, sort_keys=True)
+        os.rename(tmp_path, fingerprint_file)
+
+
+# read-only: computes what the module would do from the current connectors snapshot
+# configs missing from the snapshot (workers without expand support) are fetched per connector
+# connectors whose last deployed fingerprint matches the desired config are unchanged without any diff
+def plan_connectors(session, active_connectors, current_connectors, fingerprints=None):
+    active_connector_names = set(c['name'] for c in active_connectors)
+    plan = {
+        'create': [],
+        'update': [],
+        'delete': sorted(set(current_connectors) - active_connector_names),
+        'unchanged': [],
+        'config_diffs': {}
+    }
+
+    for connector in active_connectors:
+        name = connector['name']
+        if name not in current_connectors:
+            plan['create'].append(name)
+            continue
+
+        if fingerprints and fingerprints.get(name) == get_config_fingerprint(name, connector['config']):
+            plan['unchanged'].append(name)
+            continue
+
+        current_config = current_connectors[name]['config']
+        if current_config is None:
+            current_config = get_connector_config(session, name)
+
+        config_diff = get_config_diff(name, connector['config'], current_config)
+        if config_diff:
+            plan['update'].append(name)
+            plan['config_diffs'][name] = config_diff
+        else:
+            plan['unchanged'].append(name)
+
+    return plan
+
+
+def plan_has_changes(plan):
+    return bool(plan['create'] or plan['update'] or plan['delete'])
+
+
 def format_output(connector_name, success, message):
     if not success:
         return "{}: ERROR {}".format(connector_name, message)
@@ -350,23 +905,9 @@ def format_output(connector_name, success, message):
         return "{}: {}".format(connector_name, message)
 
 
-def run_module():
-    module_args = dict(
-        connect_url=dict(type='str', required=True),
-        active_connectors=dict(type='list', elements='dict', required=True),
-        timeout=dict(type='int', required=False, default=30),
-        token=dict(type='str', required=False, no_log=True),
-        client_cert=dict(type='path', required=False),
-        client_key=dict(type='path', required=False),
-    )
-
-    result = dict(changed=False, message='')
-
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
-
-    if module.check_mode:
-        module.exit_json(**result)
-
+# reconciles the connectors of one Connect cluster, exceptions are reported in the returned cluster result
+# return value: dict with connect_url, changed, failed, message, plan, metrics and the fingerprints of deployed connectors
+def reconcile_cluster(session, active_connectors, params, check_mode, fingerprints=None):
     #
     # module action:
     # - make a diff of existing (current) vs kept (active) connectors and removes the un-kept ones
@@ -375,78 +916,205 @@ def run_module():
     # note: using the logic below because PUT /connectors/<name>/config has proven to be unreliable
     # when the connector doesn't exist
     #
-    result['changed'] = False
-    connector_failure = False
+    # in check mode, only the plan computed from the current connectors is returned
+    # an unreachable worker, e.g. on a fresh install, is planned as an empty cluster with a warning
+    #
+    cluster_result = dict(connect_url=session.connect_url, changed=False, failed=False, message='', warnings=[])
     output_messages = []
     added_updated_messages = []
     try:
-        current_connector_names = get_current_connectors(
-            connect_url=module.params['connect_url'],
-            timeout=module.params['timeout'],
-            token=module.params['token'],
-            client_cert=module.params['client_cert'],
-            client_key=module.params['client_key']
-        )
-        active_connector_names = (c['name'] for c in module.params['active_connectors'])
-        deleted_connector_names = set(current_connector_names) - set(active_connector_names)
+        with session.metrics.timed('snapshot'):
+            try:
+                current_connectors = get_current_connectors(session)
+            except (urllib_error.URLError, http_client.HTTPException, OSError) as e:
+                # HTTP error responses mean the worker is up, only connection failures are tolerated
+                if not check_mode or isinstance(e, urllib_error.HTTPError):
+                    raise
+                cluster_result['warnings'].append(
+                    "Connect worker at {} is unreachable ({}), planning all connectors as new".format(session.connect_url, e))
+                current_connectors = {}
+        with session.metrics.timed('plan'):
+            plan = plan_connectors(session, active_connectors, current_connectors, fingerprints)
+        cluster_result['plan'] = plan
+
+        if check_mode:
+            cluster_result['changed'] = plan_has_changes(plan)
+            cluster_result['message'] = "Connectors to create: {}, to update: {}, to delete: {}, unchanged: {}.".format(
+                len(plan['create']), len(plan['update']), len(plan['delete']), len(plan['unchanged']))
+            return cluster_result
+
+        deleted_connector_names = plan['delete']
 
         for to_delete in deleted_connector_names:
-            remove_connector(
-                connect_url=module.params['connect_url'],
-                name=to_delete,
-                timeout=module.params['timeout'],
-                token=module.params['token'],
-                client_cert=module.params['client_cert'],
-                client_key=module.params['client_key']
-            )
+            remove_connector(session, to_delete)
 
         if deleted_connector_names:
+            cluster_result['changed'] = True
             output_messages.append("Connectors removed: {}.".format(', '.join(deleted_connector_names)))
 
-        active_connectors = module.params['active_connectors']
+        status_wait = dict(
+            initial_delay=params['status_initial_delay'],
+            max_backoff=params['status_max_backoff'],
+            deadline=params['status_deadline']
+        )
 
-        for connector in active_connectors:
-            try:
-                _unused = current_connector_names.index(connector['name'])
+        # new connectors are created concurrently, updates go through the rolling restart scheduler
+        # no-op runs skip the write phase entirely
+        connector_results = {}
+        to_create = [connector for connector in active_connectors if connector['name'] in plan['create']]
+        to_update = [connector for connector in active_connectors if connector['name'] in plan['update']]
 
-                success, changed, message = update_existing_connector(
-                    connect_url=module.params['connect_url'],
-                    name=connector['name'],
-                    config=connector['config'],
-                    timeout=module.params['timeout'],
-                    token=module.params['token'],
-                    client_cert=module.params['client_cert'],
-                    client_key=module.params['client_key']
-                )
-            except ValueError:
-                success, changed, message = create_new_connector(
-                    connect_url=module.params['connect_url'],
+        if to_create:
+            def create(connector):
+                return create_new_connector(
+                    session=session,
                     name=connector['name'],
                     config=connector['config'],
-                    timeout=module.params['timeout'],
-                    token=module.params['token'],
-                    client_cert=module.params['client_cert'],
-                    client_key=module.params['client_key']
+                    status_wait=status_wait
                 )
 
+            max_parallel = max(1, min(params['max_parallel'], len(to_create)))
+            with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+                connector_results.update(zip((connector['name'] for connector in to_create), executor.map(create, to_create)))
+
+        if to_update:
+            connector_results.update(schedule_updates(
+                session=session,
+                connectors=to_update,
+                batch_size=max(1, params['restart_batch_size'] or params['max_parallel']),
+                status_wait=status_wait,
+                only_failed=params['restart_only_failed'],
+                current_states=dict((name, current['state']) for name, current in current_connectors.items())
+            ))
+
+        # results are reported in the order of active_connectors, whatever the completion order
+        reconcile_results = [
+            connector_results.get(connector['name'], (True, False, "no configuration change"))
+            for connector in active_connectors
+        ]
+
+        for connector, (success, changed, message) in zip(active_connectors, reconcile_results):
             if changed:  # one connector changed is enough
-                result['changed'] = True
+                cluster_result['changed'] = True
 
             if not success:
-                connector_failure = True
+                cluster_result['failed'] = True
 
             added_updated_messages.append(format_output(connector['name'], success, message))
 
         output_messages.append("Connectors added or updated: {}.".format(', '.join(added_updated_messages)))
 
-        result['message'] = " ".join(output_messages)
+        cluster_result['message'] = " ".join(output_messages)
 
-        if connector_failure:
-            module.fail_json(msg='An error occurred while running the module', **result)
+        # failed connectors get no fingerprint so that they are compared again on the next run
+        cluster_result['fingerprints'] = dict(
+            (connector['name'], get_config_fingerprint(connector['name'], connector['config']))
+            for connector, (success, changed, message) in zip(active_connectors, reconcile_results)
+            if success
+        )
 
     except Exception as e:
-        result['message'] = str(e)
+        cluster_result['failed'] = True
+        cluster_result['message'] = str(e)
+
+    finally:
+        session.close()
+        cluster_result['metrics'] = session.metrics.to_dict()
+
+    return cluster_result
+
+
+def run_module():
+    module_args = dict(
+        connect_url=dict(type='str', required=False),
+        active_connectors=dict(type='list', elements='dict', required=False),
+        targets=dict(type='list', elements='dict', required=False, options=dict(
+            connect_url=dict(type='str', required=True),
+            active_connectors=dict(type='list', elements='dict', required=True),
+            client_cert=dict(type='path', required=False),
+            client_key=dict(type='path', required=False),
+        )),
+        timeout=dict(type='int', required=False, default=30),
+        token=dict(type='str', required=False, no_log=True),
+        client_cert=dict(type='path', required=False),
+        client_key=dict(type='path', required=False),
+        max_parallel=dict(type='int', required=False, default=1),
+        max_parallel_clusters=dict(type='int', required=False, default=8),
+        restart_batch_size=dict(type='int', required=False),
+        restart_only_failed=dict(type='bool', required=False, default=False),
+        status_initial_delay=dict(type='float', required=False, default=STATUS_INITIAL_DELAY),
+        status_max_backoff=dict(type='float', required=False, default=STATUS_MAX_BACKOFF),
+        status_deadline=dict(type='float', required=False, default=STATUS_DEADLINE),
+        fingerprint_file=dict(type='path', required=False),
+    )
+
+    result = dict(changed=False, message='')
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        mutually_exclusive=[('connect_url', 'targets')],
+        required_one_of=[('connect_url', 'targets')],
+        required_together=[('connect_url', 'active_connectors')],
+        supports_check_mode=True
+    )
+
+    if module.params['targets']:
+        targets = module.params['targets']
+    else:
+        targets = [dict(connect_url=module.params['connect_url'], active_connectors=module.params['active_connectors'])]
+
+    started_at = time.monotonic()
+    fingerprint_file = module.params['fingerprint_file']
+    fingerprints = load_fingerprints(fingerprint_file)
+
+    def reconcile_target(target):
+        session = ConnectSession(
+            connect_url=target['connect_url'],
+            timeout=module.params['timeout'],
+            token=module.params['token'],
+            client_cert=target.get('client_cert') or module.params['client_cert'],
+            client_key=target.get('client_key') or module.params['client_key']
+        )
+        return reconcile_cluster(
+            session=session,
+            active_connectors=target['active_connectors'],
+            params=module.params,
+            check_mode=module.check_mode,
+            fingerprints=fingerprints.get(target['connect_url'])
+        )
+
+    # clusters are reconciled concurrently, results keep the order of targets
+    max_parallel_clusters = max(1, min(module.params['max_parallel_clusters'], len(targets)))
+    with ThreadPoolExecutor(max_workers=max_parallel_clusters) as executor:
+        cluster_results = list(executor.map(reconcile_target, targets))
+
+    if fingerprint_file and not module.check_mode:
+        save_fingerprints(fingerprint_file, dict(
+            (cluster_result['connect_url'], cluster_result['fingerprints'])
+            for cluster_result in cluster_results if 'fingerprints' in cluster_result
+        ))
+    for cluster_result in cluster_results:
+        cluster_result.pop('fingerprints', None)
+        for warning in cluster_result.pop('warnings'):
+            module.warn(warning)
+
+    result['changed'] = any(cluster_result['changed'] for cluster_result in cluster_results)
+    if module.params['targets']:
+        result['clusters'] = cluster_results
+        result['message'] = " ".join(
+            "{}: {}".format(cluster_result['connect_url'], cluster_result['message']) for cluster_result in cluster_results)
+        result['metrics'] = dict(
+            (counter, sum(cluster_result['metrics'][counter] for cluster_result in cluster_results))
+            for counter in ('http_calls', 'http_retries', 'status_polls')
+        )
+        result['metrics']['total_seconds'] = round(time.monotonic() - started_at, 3)
+    else:
+        result['message'] = cluster_results[0]['message']
+        result['metrics'] = cluster_results[0]['metrics']
+        if 'plan' in cluster_results[0]:
+            result['plan'] = cluster_results[0]['plan']
 
+    if any(cluster_result['failed'] for cluster_result in cluster_results):
         module.fail_json(msg='An error occurred while running the module', **result)
 
     module.exit_json(**result)
@@ -14,24 +14,32 @@ description:
     - Configures DefaultRolloverStrategy with Delete action using glob patterns to ensure proper cleanup of both old-pattern and new-pattern
       log files when file count exceeds the specified maximum.
     - Optionally updates the root logger level and adds a Rewrite appender with RedactorPolicy for log redaction.
+    - Several files, e.g. those of all components of a host, can be updated in one execution with I(entries).
 requirements:
     - PyYAML
+    - ruamel.yaml, for I(round_trip)
+notes:
+    - Supports C(--diff), the diff shows the RollingFile, Rewrite and Loggers sections that changed.
+    - Files are only written when a section changed, through a temporary file moved over the original.
 options:
     path:
         type: str
-        required: true
+        required: false
         description:
             - Path to the log4j2 YAML file to update.
+            - Exactly one of I(path) and I(entries) is required.
     size:
         type: str
-        required: true
+        required: false
         description:
             - Value for SizeBasedTriggeringPolicy (e.g., '100MB').
+            - Required, here or in every entry.
     max:
         type: str
-        required: true
+        required: false
         description:
             - Value for DefaultRolloverStrategy max (e.g., '10').
+            - Required, here or in every entry.
     root_level:
         type: str
         required: false
@@ -40,9 +48,10 @@ options:
     root_appenders:
         type: list
         elements: str
-        required: true
+        required: false
         description:
             - List of appender names to set in the root logger's AppenderRef.
+            - Required, here or in every entry.
     add_redactor:
         type: bool
         required: false
@@ -75,6 +84,85 @@ options:
         required: false
         description:
             - List of logger names to apply the RedactorAppender to.
+            - An entry with shell-style wildcards (*, ?, [seq]), e.g. io.confluent.connect.*, applies to every existing logger whose name matches.
+            - Wildcard entries never add loggers; plain names that are missing are added.
+    digest:
+        type: bool
+        required: false
+        default: true
+        description:
+            - Whether to record the digest of the file content and options last applied in a sidecar file, I(path).digest.
+            - When the file and options still match that digest, the file is not parsed again and nothing changes.
+            - The digest also covers the version of the module's update logic, files are updated again after an upgrade that changes it.
+    round_trip:
+        type: bool
+        required: false
+        default: false
+        description:
+            - Whether to keep the comments, quoting, key order and indentation of the file when writing it back.
+            - Sections that did not change are written back as they were.
+            - Requires the ruamel.yaml python module, otherwise the file is rewritten by PyYAML without comments.
+    entries:
+        type: list
+        elements: dict
+        required: false
+        description:
+            - List of log4j2 YAML files to update in one execution.
+            - Each entry takes I(path) and any of the other options, options it does not set are taken from the module options.
+            - Must list at least one file.
+        suboptions:
+            path:
+                type: str
+                required: true
+                description:
+                    - Path to the log4j2 YAML file to update.
+            size:
+                type: str
+                description:
+                    - Value for SizeBasedTriggeringPolicy of this file.
+            max:
+                type: str
+                description:
+                    - Value for DefaultRolloverStrategy max of this file.
+            root_level:
+                type: str
+                description:
+                    - Root logger level of this file.
+            root_appenders:
+                type: list
+                elements: str
+                description:
+                    - Appender names of the root logger of this file.
+            add_redactor:
+                type: bool
+                description:
+                    - Whether to add/update the RedactorAppender of this file.
+            redactor_refs:
+                type: list
+                elements: str
+                description:
+                    - Appender names the RedactorAppender of this file references.
+            redactor_rules:
+                type: str
+                description:
+                    - Path to the redactor rules file of this file.
+            redactor_policy_refresh_interval:
+                type: str
+                description:
+                    - Policy refresh interval of the RedactorAppender of this file.
+            redactor_logger_names:
+                type: list
+                elements: str
+                description:
+                    - Logger names to apply the RedactorAppender of this file to.
+            digest:
+                type: bool
+                description:
+                    - Whether to record and check the digest sidecar file of this file.
+            round_trip:
+                type: bool
+                description:
+                    - Whether to keep the comments and formatting of this file.
 author:
     - Mansi Sinha (@mansisinha)
 '''
@@ -118,6 +206,38 @@ EXAMPLES = '''
 # Root logger: ConnectAppender removed, gets [STDOUT, RedactorAppender]
 # org.apache.kafka logger: FileAppender removed, gets [RedactorAppender] + any existing non-FileAppender refs
 # RedactorAppender handles both ConnectAppender and FileAppender with redaction
+
+# Redact all per-connector loggers of a Connect log4j2.yaml with one entry
+- name: Update connect-log4j2.yaml with redactor appender for a logger family
+  update_log4j2:
+    path: /etc/kafka/connect-log4j2.yaml
+    size: 100MB
+    max: 10
+    root_appenders:
+      - ConnectAppender
+    add_redactor: true
+    redactor_refs:
+      - ConnectAppender
+    redactor_rules: /etc/kafka/redactor-rules.json
+    redactor_logger_names:
+      - io.confluent.connect.*
+# Result: every existing logger whose name starts with io.confluent.connect. gets RedactorAppender instead of ConnectAppender
+
+# Update the log4j2.yaml files of all components of a host in one execution
+- name: Update log4j2.yaml policies of colocated components
+  update_log4j2:
+    size: 100MB
+    max: 10
+    root_appenders:
+      - RollingFile
+    entries:
+      - path: /etc/kafka/log4j2.yaml
+      - path: /etc/kafka/connect-log4j2.yaml
+        root_appenders:
+          - ConnectAppender
+      - path: /etc/schema-registry/log4j2.yaml
+        max: 5
+# Result: files lists the path, changed and message of each file
 '''
 
 RETURN = '''
@@ -126,12 +246,29 @@ changed:
     type: bool
     returned: always
 message:
-    description: Summary of actions taken
+    description: Summary of actions taken, with the sections that changed
     type: str
     returned: always
+diff:
+    description: Before and after of each changed RollingFile, Rewrite and Loggers section
+    type: list
+    elements: dict
+    returned: in diff mode
+files:
+    description: Result of each file, with its path, changed, message and, in diff mode, diff
+    type: list
+    elements: dict
+    returned: when entries is set
 '''
 
+import copy
+import fnmatch
+import hashlib
+import io
+import json
 import os
+import re
+import tempfile
 from ansible.module_utils.basic import AnsibleModule
 try:
     import yaml
@@ -139,6 +276,205 @@ except ImportError:
     HAS_YAML = False
 else:
     HAS_YAML = True
+    # Prefer the libyaml C implementations, they are much faster than the pure Python ones
+    try:
+        from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+    except ImportError:
+        from yaml import SafeLoader, SafeDumper
+try:
+    from ruamel.yaml import YAML
+    from ruamel.yaml.scalarbool import ScalarBoolean
+except ImportError:
+    HAS_RUAMEL_YAML = False
+else:
+    HAS_RUAMEL_YAML = True
+
+# Sections of Configuration the module updates, as (name, path from Configuration)
+UPDATED_SECTIONS = (
+    ('RollingFile', ('Appenders', 'RollingFile')),
+    ('Rewrite', ('Appenders', 'Rewrite')),
+    ('Loggers', ('Loggers',)),
+)
+
+# Version of what the module writes, part of the digest. Bump it whenever a change to the module changes the
+# resulting file for the same content and options, so files recorded by an earlier version are updated again
+DIGEST_VERSION = 1
+
+DIGEST_OPTIONS = ('size', 'max', 'root_level', 'root_appenders', 'add_redactor', 'redactor_refs',
+                  'redactor_rules', 'redactor_policy_refresh_interval', 'redactor_logger_names', 'round_trip')
+
+
+def get_applied_digest(content, params):
+    """
+    Digest of a log4j2 file content together with the options applied to it and the module's DIGEST_VERSION.
+
+    Args:
+        content: The file content as bytes
+        params: The module parameters
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    options = dict((option, params.get(option)) for option in DIGEST_OPTIONS)
+    digest = hashlib.sha256(content)
+    digest.update(json.dumps(dict(version=DIGEST_VERSION, options=options), sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def read_digest(digest_path):
+    """Return the digest recorded in digest_path, or None when there is none."""
+    try:
+        with open(digest_path, 'r') as f:
+            return f.read().strip()
+    except (IOError, OSError):
+        return None
+
+
+def to_plain(value):
+    """
+    Convert round-trip YAML values to plain Python values the PyYAML SafeDumper can represent.
+
+    ruamel.yaml keeps the formatting of scalars in subclasses of str, int, float and bool
+    (e.g. quoted strings, ScalarFloat, HexInt, ScalarBoolean), SafeDumper only represents the exact types.
+    """
+    if isinstance(value, dict):
+        return dict((key, to_plain(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [to_plain(item) for item in value]
+    if isinstance(value, str):
+        return str(value)
+    # bool before int, bool and ScalarBoolean are int subclasses
+    if isinstance(value, bool) or (HAS_RUAMEL_YAML and isinstance(value, ScalarBoolean)):
+        return bool(value)
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float):
+        return float(value)
+    return value
+
+
+def get_sections(data):
+    """
+    Snapshot the sections of a log4j2 document the module updates.
+
+    Returns:
+        dict: Section name to a plain copy of the section, None when the section is absent
+    """
+    sections = {}
+    for name, section_path in UPDATED_SECTIONS:
+        section = data.get('Configuration')
+        for key in section_path:
+            section = section.get(key) if isinstance(section, dict) else None
+        sections[name] = copy.deepcopy(to_plain(section))
+    return sections
+
+
+def get_sections_diff(path, before, after):
+    """
+    Structural diff of the updated sections, in Ansible diff format.
+
+    Returns:
+        tuple: (list of changed section names, list of diff dicts with one entry per changed section)
+    """
+    changed_sections = []
+    diff = []
+    for name, section_path in UPDATED_SECTIONS:
+        if before[name] == after[name]:
+            continue
+        changed_sections.append(name)
+        header = f"{path} Configuration.{'.'.join(section_path)}"
+        diff.append(dict(
+            before_header=header,
+            after_header=header,
+            before='' if before[name] is None else yaml.dump(
+                before[name], Dumper=SafeDumper, default_flow_style=False, sort_keys=False),
+            after='' if after[name] is None else yaml.dump(
+                after[name], Dumper=SafeDumper, default_flow_style=False, sort_keys=False),
+        ))
+    return changed_sections, diff
+
+
+def guess_indentation(text):
+    """
+    Guess the block indentation of a YAML document from the first nested mapping and sequence.
+
+    Returns:
+        tuple: (mapping indent, sequence indent, sequence dash offset) for ruamel.yaml's YAML.indent
+    """
+    mapping_indent = None
+    offset = None
+    previous = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#'):
+            continue
+        indent = len(line) - len(line.lstrip(' '))
+        if previous is not None and previous[1].endswith(':') and indent > previous[0]:
+            if stripped.startswith('- '):
+                if offset is None:
+                    offset = indent - previous[0]
+            elif mapping_indent is None and not previous[1].startswith('- '):
+                mapping_indent = indent - previous[0]
+        if mapping_indent is not None and offset is not None:
+            break
+        previous = (indent, stripped)
+    mapping_indent = mapping_indent or 2
+    offset = offset or 0
+    return mapping_indent, offset + 2, offset
+
+
+def load_document(content, round_trip):
+    """
+    Parse a log4j2 YAML document.
+
+    With round_trip, the document keeps its comments, quoting and indentation for dump_document.
+
+    Returns:
+        tuple: (data, round-trip YAML instance or None)
+    """
+    if not round_trip:
+        return yaml.load(content, Loader=SafeLoader), None
+    text = content.decode('utf-8')
+    mapping_indent, sequence_indent, offset = guess_indentation(text)
+    yaml_rt = YAML()
+    yaml_rt.preserve_quotes = True
+    yaml_rt.width = 4096
+    yaml_rt.indent(mapping=mapping_indent, sequence=sequence_indent, offset=offset)
+    return yaml_rt.load(text), yaml_rt
+
+
+def dump_document(data, yaml_rt):
+    """Serialize a log4j2 document loaded by load_document, returns bytes."""
+    if yaml_rt is None:
+        return yaml.dump(data, Dumper=SafeDumper, default_flow_style=False, sort_keys=False).encode('utf-8')
+    stream = io.StringIO()
+    yaml_rt.dump(data, stream)
+    return stream.getvalue().encode('utf-8')
+
+
+def write_atomically(module, path, content):
+    """Write content to a temporary file next to path and move it over path, keeping its owner, mode and context."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.' + os.path.basename(path) + '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+    module.atomic_move(temp_path, path)
+
+
+def write_digest(digest_path, digest):
+    """Record digest in digest_path, a failure to write it only means the next run parses the file again."""
+    try:
+        with open(digest_path, 'w') as f:
+            f.write(digest + '\n')
+    except (IOError, OSError):
+        pass
+
+
+class Log4j2UpdateError(Exception):
+    """Invalid options or missing file, reported with fail_json."""
 
 
 def update_logger_appender_refs(logger, logger_redacted_appender, redactor_name):
@@ -159,78 +495,92 @@ def update_logger_appender_refs(logger, logger_redacted_appender, redactor_name)
     elif isinstance(logger['AppenderRef'], dict):
         logger['AppenderRef'] = [logger['AppenderRef']]
 
-    # Remove this logger's specific redacted appender and add redactor appender
-    current_refs = [ref.get('ref') for ref in logger['AppenderRef']]
-    # Keep only appenders that are NOT this logger's redacted appender
-    filtered_refs = [ref for ref in current_refs if ref != logger_redacted_appender]
-    # Add redactor if not already present
-    if redactor_name not in filtered_refs:
-        filtered_refs.append(redactor_name)
+    # Single pass: drop this logger's redacted appender and note whether the redactor is already referenced
+    new_refs = []
+    has_redactor = False
+    for ref in logger['AppenderRef']:
+        ref_name = ref.get('ref')
+        if ref_name == logger_redacted_appender:
+            continue
+        if ref_name == redactor_name:
+            has_redactor = True
+        new_refs.append({'ref': ref_name})
+    if not has_redactor:
+        new_refs.append({'ref': redactor_name})
 
     # Update AppenderRef if changed
-    new_refs = [{'ref': ref} for ref in filtered_refs]
     if logger['AppenderRef'] != new_refs:
         logger['AppenderRef'] = new_refs
         return True
     return False
 
 
-def main():
+def is_logger_pattern(logger_name):
+    """Whether a redactor_logger_names entry selects a family of loggers (e.g. io.confluent.connect.*)."""
+    return any(char in logger_name for char in '*?[')
 
-    module_args = dict(
-        path=dict(type='str', required=True),
-        size=dict(type='str', required=True),
-        max=dict(type='str', required=True),
-        root_level=dict(type='str', required=False, default=None),
-        root_appenders=dict(type='list', elements='str', required=True),
-        add_redactor=dict(type='bool', required=False, default=False),
-        redactor_refs=dict(type='list', elements='str', required=False),
-        redactor_rules=dict(type='str', required=False),
-        redactor_policy_refresh_interval=dict(type='str', required=False),
-        redactor_logger_names=dict(type='list', elements='str', required=False),
-    )
 
-    result = dict(changed=False, message='')
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
-    if not HAS_YAML:
-        module.fail_json(
-            msg="The python PyYAML module is required on Target nodes. "
-                "Install it with 'pip install PyYAML'"
-        )
+def update_log4j2_file(module, params):
+    """
+    Apply the RollingFile, root logger and redactor settings of params to one log4j2 YAML file.
+
+    The file is only written when one of its sections changed, atomically. In check mode it is not written.
 
-    path = module.params['path']
-    size = module.params['size']
-    max_backup = module.params['max']
-    root_level = module.params['root_level']
-    root_appenders = module.params['root_appenders']
+    Args:
+        module: The AnsibleModule, for check mode, diff mode and atomic moves
+        params: The options of the file, as in the module parameters
+
+    Returns:
+        dict: path, changed and message of the file, and its diff in diff mode
+
+    Raises:
+        Log4j2UpdateError: When the options are invalid or the file does not exist
+    """
+    result = dict(path=params['path'], changed=False, message='')
+
+    path = params['path']
+    size = params['size']
+    max_backup = params['max']
+    root_level = params['root_level']
+    root_appenders = params['root_appenders']
 
     # New redactor parameters
-    add_redactor = module.params['add_redactor']
-    redactor_refs = module.params['redactor_refs']
-    redactor_rules = module.params['redactor_rules']
-    redactor_policy_refresh_interval = module.params['redactor_policy_refresh_interval']
-    redactor_logger_names = module.params['redactor_logger_names'] or []
+    add_redactor = params['add_redactor']
+    redactor_refs = params['redactor_refs']
+    redactor_rules = params['redactor_rules']
+    redactor_policy_refresh_interval = params['redactor_policy_refresh_interval']
+    redactor_logger_names = params['redactor_logger_names'] or []
 
     # Validate parameters when adding redactor
     if add_redactor:
         if not redactor_refs:
-            module.fail_json(msg="redactor_refs is required when add_redactor=true", **result)
+            raise Log4j2UpdateError("redactor_refs is required when add_redactor=true")
         if not redactor_rules:
-            module.fail_json(msg="redactor_rules is required when add_redactor=true", **result)
+            raise Log4j2UpdateError("redactor_rules is required when add_redactor=true")
         if not redactor_logger_names:
-            module.fail_json(msg="redactor_logger_names is required when add_redactor=true", **result)
+            raise Log4j2UpdateError("redactor_logger_names is required when add_redactor=true")
         if len(redactor_refs) != len(redactor_logger_names):
-            module.fail_json(
-                msg=f"number of appenderRefs ({len(redactor_refs)}) and "
-                    f"logger_name ({len(redactor_logger_names)}) must be equal",
-                **result
+            raise Log4j2UpdateError(
+                f"number of appenderRefs ({len(redactor_refs)}) and "
+                f"logger_name ({len(redactor_logger_names)}) must be equal"
             )
 
     if not os.path.exists(path):
-        module.fail_json(msg=f"File {path} does not exist.", **result)
+        raise Log4j2UpdateError(f"File {path} does not exist.")
 
-    with open(path, 'r') as f:
-        data = yaml.safe_load(f)
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    # Skip parsing when this exact content was the result of applying these exact options
+    digest_path = path + '.digest'
+    if params['digest'] and read_digest(digest_path) == get_applied_digest(content, params):
+        result['message'] = "No changes needed."
+        if module._diff:
+            result['diff'] = []
+        return result
+
+    data, yaml_rt = load_document(content, params['round_trip'])
+    sections_before = get_sections(data)
 
     changed = False
     # Normalize RollingFile to always be a list for processing
@@ -344,7 +694,7 @@ def main():
         rewrite_config = {
             'name': redactor_name,
             'RedactorPolicy': redactor_policy,
-            'AppenderRef': [{'ref': ref} for ref in list(set(redactor_refs))]
+            'AppenderRef': [{'ref': ref} for ref in dict.fromkeys(redactor_refs)]
         }
 
         # Check if Rewrite appender already exists with exactly the same configuration
@@ -365,8 +715,16 @@ def main():
             elif isinstance(data['Configuration']['Loggers']['Logger'], dict):
                 data['Configuration']['Loggers']['Logger'] = [data['Configuration']['Loggers']['Logger']]
 
-            # For each specified logger, ensure it has the redactor appender
+            # Index the loggers by name once, the first logger wins on duplicate names
             loggers_list = data['Configuration']['Loggers']['Logger']
+            logger_index = {}
+            for logger in loggers_list:
+                logger_index.setdefault(logger.get('name'), logger)
+
+            # Wildcard entries are matched against all existing loggers in a single pass below
+            logger_patterns = []
+
+            # For each specified logger, ensure it has the redactor appender
             for i, logger_name in enumerate(redactor_logger_names):
                 # Get the corresponding appender for this logger
                 logger_redacted_appender = redactor_refs[i]
@@ -379,18 +737,18 @@ def main():
                         changed = True
                     continue
 
-                # Find the logger by name (case sensitive match)
-                found = False
-                for logger in loggers_list:
-                    if logger.get('name') == logger_name:
-                        found = True
-                        # Update the logger's appender references
-                        if update_logger_appender_refs(logger, logger_redacted_appender, redactor_name):
-                            changed = True
-                        break
+                if is_logger_pattern(logger_name):
+                    logger_patterns.append((re.compile(fnmatch.translate(logger_name)), logger_redacted_appender))
+                    continue
 
-                # If logger not found, add it (with exact name, preserving case)
-                if not found:
+                # Find the logger by name (case sensitive match)
+                logger = logger_index.get(logger_name)
+                if logger is not None:
+                    # Update the logger's appender references
+                    if update_logger_appender_refs(logger, logger_redacted_appender, redactor_name):
+                        changed = True
+                else:
+                    # If logger not found, add it (with exact name, preserving case)
                     new_logger = {
                         'name': logger_name,
                         'level': 'info',  # Default level
@@ -398,40 +756,117 @@ def main():
                         'AppenderRef': [{'ref': redactor_name}]
                     }
                     loggers_list.append(new_logger)
+                    logger_index[logger_name] = new_logger
                     changed = True
 
+            # Apply wildcard entries to every existing logger they match, patterns never create loggers
+            if logger_patterns:
+                for name, logger in logger_index.items():
+                    if not isinstance(name, str):
+                        continue
+                    for pattern, logger_redacted_appender in logger_patterns:
+                        if pattern.match(name) and update_logger_appender_refs(logger, logger_redacted_appender, redactor_name):
+                            changed = True
+
             # If only one logger and it was originally a dict, convert back to dict
             if len(loggers_list) == 1 and isinstance(data['Configuration']['Loggers'].get('Logger', []), dict):
                 data['Configuration']['Loggers']['Logger'] = loggers_list[0]
 
-    if changed and not module.check_mode:
-        with open(path, 'w') as f:
-            yaml.dump(data, f, default_flow_style=False, sort_keys=False)
-
-        result['message'] = (
-            f"Updated {path}: removed TimeBasedTriggeringPolicy, "
-            f"added/updated SizeBasedTriggeringPolicy, added index counter (%i) "
-            f"to filePattern while preserving date information, and configured "
-            f"DefaultRolloverStrategy with Delete action to ensure proper cleanup "
-            f"of old and new log files when count exceeds {max_backup}."
-        )
-        if root_level:
-            result['message'] += f" Set root logger level to {root_level}."
-
-        # Update message for root logger appenders
-        if not add_redactor:
-            result['message'] += f" Set root logger appenders to {root_appenders}."
+    changed_sections, diff = get_sections_diff(path, sections_before, get_sections(data))
+    if module._diff:
+        result['diff'] = diff
 
-        if add_redactor:
-            result['message'] += (
-                f" Added/updated Rewrite appender '{redactor_name}', "
-                f"referencing {redactor_refs} to {len(redactor_logger_names)} "
-                f"logger(s)."
-            )
+    if changed and not module.check_mode:
+        content = dump_document(data, yaml_rt)
+        write_atomically(module, path, content)
+        result['message'] = f"Updated {path}: changed {', '.join(changed_sections) or 'formatting'}."
+    elif changed:
+        result['message'] = f"Would update {path}: changed {', '.join(changed_sections) or 'formatting'}."
     else:
         result['message'] = "No changes needed."
 
+    if params['digest'] and not module.check_mode:
+        write_digest(digest_path, get_applied_digest(content, params))
+
     result['changed'] = changed
+    return result
+
+
+def main():
+
+    module_args = dict(
+        path=dict(type='str', required=False),
+        size=dict(type='str', required=False),
+        max=dict(type='str', required=False),
+        root_level=dict(type='str', required=False, default=None),
+        root_appenders=dict(type='list', elements='str', required=False),
+        add_redactor=dict(type='bool', required=False, default=False),
+        redactor_refs=dict(type='list', elements='str', required=False),
+        redactor_rules=dict(type='str', required=False),
+        redactor_policy_refresh_interval=dict(type='str', required=False),
+        redactor_logger_names=dict(type='list', elements='str', required=False),
+        digest=dict(type='bool', required=False, default=True),
+        round_trip=dict(type='bool', required=False, default=False),
+        entries=dict(type='list', elements='dict', required=False, options=dict(
+            path=dict(type='str', required=True),
+            size=dict(type='str', required=False),
+            max=dict(type='str', required=False),
+            root_level=dict(type='str', required=False),
+            root_appenders=dict(type='list', elements='str', required=False),
+            add_redactor=dict(type='bool', required=False),
+            redactor_refs=dict(type='list', elements='str', required=False),
+            redactor_rules=dict(type='str', required=False),
+            redactor_policy_refresh_interval=dict(type='str', required=False),
+            redactor_logger_names=dict(type='list', elements='str', required=False),
+            digest=dict(type='bool', required=False),
+            round_trip=dict(type='bool', required=False),
+        )),
+    )
+
+    result = dict(changed=False, message='')
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+        required_one_of=[('path', 'entries')],
+        mutually_exclusive=[('path', 'entries')],
+    )
+    if not HAS_YAML:
+        module.fail_json(
+            msg="The python PyYAML module is required on Target nodes. "
+                "Install it with 'pip install PyYAML'"
+        )
+
+    # required_one_of accepts an empty list, which would leave no file to update
+    if module.params['entries'] == []:
+        module.fail_json(msg="entries must list at least one file", **result)
+
+    # Without entries, the module options describe a single file
+    # Entries inherit every option they do not set from the module options
+    entries = module.params['entries'] or [dict(path=module.params['path'])]
+    files = []
+    for entry in entries:
+        params = dict(module.params)
+        params.update((option, value) for option, value in entry.items() if value is not None)
+        missing = [option for option in ('size', 'max', 'root_appenders') if params[option] is None]
+        if missing:
+            module.fail_json(msg=f"{', '.join(missing)} required for {params['path']}", files=files, **result)
+        try:
+            if params['round_trip'] and not HAS_RUAMEL_YAML:
+                module.fail_json(msg="The python ruamel.yaml module is required on Target nodes for round_trip. "
+                                     "Install it with 'pip install ruamel.yaml'", files=files, **result)
+            file_result = update_log4j2_file(module, params)
+        except Log4j2UpdateError as e:
+            module.fail_json(msg=str(e), files=files, **result)
+        files.append(file_result)
+        result['changed'] = result['changed'] or file_result['changed']
+
+    if module._diff:
+        result['diff'] = [file_diff for file_result in files for file_diff in file_result['diff']]
+    if module.params['entries'] is None:
+        result['message'] = files[0]['message']
+    else:
+        result['files'] = files
+        result['message'] = f"Updated {sum(file_result['changed'] for file_result in files)} of {len(files)} file(s)."
     module.exit_json(**result)
 
 
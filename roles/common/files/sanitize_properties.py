@@ -6,9 +6,16 @@ Sanitizes sensitive data from configuration files while preserving
 non-sensitive metadata like paths, algorithms, and timeout values.
 """
 
+import io
+import json
+import os
 import re
+import shutil
 import sys
 import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
 
@@ -62,12 +69,51 @@ class PropertySanitizer:
         r'.*\.protocol\.map$',                  # Protocol mappings
     ]
 
-    def __init__(self):
-        self.exclude_compiled = [re.compile(pattern, re.IGNORECASE) for pattern in self.EXCLUDE_PATTERNS]
+    # Inventory keys that are never sanitized by the general keyword check
+    INVENTORY_EXCLUDE_SUFFIXES = ['_path:', '_location:', '_algorithm:', '_provider:']
+
+    # Maximum number of per-key verdicts kept by is_sensitive
+    VERDICT_CACHE_SIZE = 4096
+
+    # Line formats
+    PROPERTY_LINE = re.compile(r'^([^=]+)=(.*)')
+    ENVIRONMENT_LINE = re.compile(r'^(Environment=\s*[^=]+=).*')
+    INVENTORY_LINE = re.compile(r'^(\s*[^#:]+:\s*).*$')
+
+    def __init__(self, verbose=True):
+        # verbose prints one line per sanitized file, batch mode reports a JSON summary instead
+        self.verbose = verbose
+
+        # All rules are compiled once into combined alternations, each one is a single regex scan per line or key
+        self.exclude_regex = re.compile(
+            '|'.join(f'(?:{pattern})' for pattern in self.EXCLUDE_PATTERNS), re.IGNORECASE
+        )
+        sensitive_suffixes = [f'.{keyword}' for keyword in self.CORE_SENSITIVE_KEYWORDS]
+        sensitive_suffixes += [suffix.lower() for suffix in self.ADDITIONAL_PROPERTY_SUFFIXES]
+        self.sensitive_suffix_regex = re.compile(
+            '(?:' + '|'.join(re.escape(suffix) for suffix in sensitive_suffixes) + r')\Z'
+        )
+        self.environment_keyword_regex = re.compile(
+            '|'.join(re.escape(keyword.upper()) for keyword in self.CORE_SENSITIVE_KEYWORDS)
+        )
+        self.environment_exact_regex = re.compile(
+            '|'.join(re.escape(exact) for exact in sorted(self.EXACT_SENSITIVE))
+        )
+        self.ansible_var_regex = re.compile(
+            r'^(\s*(?:' + '|'.join(re.escape(var) for var in self.ANSIBLE_SENSITIVE_VARS) + r')\s*:\s*).*$'
+        )
+        self.inventory_keyword_regex = re.compile(
+            '|'.join(re.escape(f'{keyword}:') for keyword in self.CORE_SENSITIVE_KEYWORDS)
+        )
+        self.inventory_exclude_regex = re.compile(
+            '|'.join(re.escape(exclude) for exclude in self.INVENTORY_EXCLUDE_SUFFIXES)
+        )
+        # Support bundles repeat the same keys across hosts and components, verdicts are cached per key
+        self.is_sensitive = lru_cache(maxsize=self.VERDICT_CACHE_SIZE)(self.is_sensitive)
 
     def is_excluded(self, key):
         """Check if a property key should be excluded from sanitization."""
-        return any(pattern.match(key) for pattern in self.exclude_compiled)
+        return self.exclude_regex.match(key) is not None
 
     def is_sensitive(self, key):
         """Determine if a property key contains sensitive data."""
@@ -79,69 +125,91 @@ class PropertySanitizer:
         if self.is_excluded(key):
             return False
 
-        key_lower = key.lower()
+        # Check core keywords (e.g., .password, .secret, .key, .token) and additional property-specific suffixes
+        return self.sensitive_suffix_regex.search(key.lower()) is not None
 
-        # Check core keywords as suffixes (e.g., .password, .secret, .key, .token)
-        for keyword in self.CORE_SENSITIVE_KEYWORDS:
-            if key_lower.endswith(f'.{keyword}'):
-                return True
+    SANITIZED_HEADER = "# THIS FILE HAS BEEN SANITIZED - SENSITIVE VALUES REDACTED\n"
 
-        # Check additional property-specific suffixes
-        for suffix in self.ADDITIONAL_PROPERTY_SUFFIXES:
-            if key_lower.endswith(suffix.lower()):
-                return True
-
-        return False
-
-    def _sanitize_file_base(self, file_path, line_processor, item_type, in_place=True):
+    def _sanitize_stream(self, source, target, line_processor):
         """
-        Base method for sanitizing files with common I/O logic.
+        Sanitize lines from source into target one at a time, using constant memory.
 
         Args:
-            file_path: Path to the file to sanitize
+            source: Iterable of lines, e.g. a text file object
+            target: Text file object the sanitized lines are written to
             line_processor: Function(line) -> (processed_line, was_sanitized)
-            item_type: Description of items being sanitized (for logging)
-            in_place: If True, modify file in place; if False, return sanitized content
 
         Returns:
-            Sanitized content string if in_place=False, else None
+            Number of sanitized lines
         """
-        path = Path(file_path)
-        if not path.exists():
-            print(f"Warning: File not found: {file_path}", file=sys.stderr)
-            return None
-
-        with open(path, 'r', encoding='utf-8', errors='replace') as f:
-            content = f.readlines()
-
-        lines = []
         sanitized_count = 0
 
         # Add sanitization header
-        lines.append("# THIS FILE HAS BEEN SANITIZED - SENSITIVE VALUES REDACTED\n")
+        target.write(self.SANITIZED_HEADER)
 
-        for line in content:
+        for line in source:
             # Skip existing sanitization headers
             if 'THIS FILE HAS BEEN SANITIZED' in line:
                 continue
 
             # Process line using the provided processor
             processed_line, was_sanitized = line_processor(line)
-            lines.append(processed_line)
+            target.write(processed_line)
             if was_sanitized:
                 sanitized_count += 1
 
-        sanitized_content = ''.join(lines)
+        return sanitized_count
 
-        if in_place:
-            # Write back to file
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write(sanitized_content)
-            print(f"Sanitized {sanitized_count} {item_type} in {file_path}")
+    def _sanitize_file_base(self, file_path, line_processor, item_type, in_place=True):
+        """
+        Base method for sanitizing files with common I/O logic.
+
+        Files are streamed line by line. In place, the sanitized lines go to a temporary file
+        in the same directory which is then atomically renamed over the original.
+        A file_path of '-' streams from stdin to stdout.
+
+        Args:
+            file_path: Path to the file to sanitize, or '-' for stdin
+            line_processor: Function(line) -> (processed_line, was_sanitized)
+            item_type: Description of items being sanitized (for logging)
+            in_place: If True, modify file in place; if False, return sanitized content
+
+        Returns:
+            Sanitized content string if in_place=False, else the number of sanitized items
+        """
+        if file_path == '-':
+            source = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', errors='replace')
+            target = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+            self._sanitize_stream(source, target, line_processor)
+            target.flush()
+            target.detach()
             return None
-        else:
-            # Return content for dry-run
-            return sanitized_content
+
+        path = Path(file_path)
+        if not path.exists():
+            print(f"Warning: File not found: {file_path}", file=sys.stderr)
+            return None
+
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            if not in_place:
+                # Return content for dry-run
+                target = io.StringIO()
+                self._sanitize_stream(f, target, line_processor)
+                return target.getvalue()
+
+            fd, temp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f'.{path.name}.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as target:
+                    sanitized_count = self._sanitize_stream(f, target, line_processor)
+                shutil.copymode(str(path), temp_path)
+                os.replace(temp_path, str(path))
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+
+        if self.verbose:
+            print(f"Sanitized {sanitized_count} {item_type} in {file_path}")
+        return sanitized_count
 
     def sanitize_properties_file(self, file_path, in_place=True):
         """
@@ -152,7 +220,7 @@ class PropertySanitizer:
             in_place: If True, modify file in place; if False, return sanitized content
 
         Returns:
-            Sanitized content if in_place=False, else None
+            Sanitized content if in_place=False, else the number of sanitized properties
         """
         def process_properties_line(line):
             """Process a single line from a .properties file."""
@@ -161,7 +229,7 @@ class PropertySanitizer:
                 return line, False
 
             # Parse property line (key=value format)
-            match = re.match(r'^([^=]+)=(.*)', line)
+            match = self.PROPERTY_LINE.match(line)
             if not match:
                 return line, False
 
@@ -190,16 +258,14 @@ class PropertySanitizer:
                 line_upper = line.upper()
 
                 # Check if line contains any core sensitive keyword
-                should_sanitize = any(keyword.upper() in line_upper
-                                      for keyword in self.CORE_SENSITIVE_KEYWORDS)
+                should_sanitize = self.environment_keyword_regex.search(line_upper) is not None
 
                 # Also check exact sensitive matches
-                should_sanitize = should_sanitize or any(exact in line
-                                                         for exact in self.EXACT_SENSITIVE)
+                should_sanitize = should_sanitize or self.environment_exact_regex.search(line) is not None
 
                 if should_sanitize:
                     # Extract variable name and redact value
-                    match = re.match(r'^(Environment=\s*[^=]+=).*', line)
+                    match = self.ENVIRONMENT_LINE.match(line)
                     if match:
                         return f"{match.group(1)}***REDACTED***\n", True
                     return line, False
@@ -225,27 +291,23 @@ class PropertySanitizer:
                 return line, False
 
             # Check for Ansible-specific sensitive variables (exact match)
-            for var in self.ANSIBLE_SENSITIVE_VARS:
-                # Match: ansible_password: value (YAML format)
-                pattern = rf'^(\s*{var}\s*:\s*).*$'
-                match = re.match(pattern, line)
-                if match:
-                    return f"{match.group(1)}***REDACTED***\n", True
+            # Match: ansible_password: value (YAML format)
+            match = self.ansible_var_regex.match(line)
+            if match:
+                return f"{match.group(1)}***REDACTED***\n", True
 
             # Check for general sensitive patterns using unified core keywords
             # But only in YAML value context (after :)
             if ':' in line:
                 lower_line = line.lower()
 
-                # Build patterns from core keywords (password:, secret:, key:, token:, credential:)
-                sensitive_patterns = [f'{keyword}:' for keyword in self.CORE_SENSITIVE_KEYWORDS]
-
+                # Core keywords followed by a colon (password:, secret:, key:, token:, credential:)
                 # Avoid false positives like 'ssl_key_path' by being more specific
-                if any(pattern in lower_line for pattern in sensitive_patterns):
+                if self.inventory_keyword_regex.search(lower_line):
                     # Don't sanitize if it's a path/location/algorithm/provider
-                    if not any(exclude in lower_line for exclude in ['_path:', '_location:', '_algorithm:', '_provider:']):
+                    if not self.inventory_exclude_regex.search(lower_line):
                         # Extract key and redact value
-                        match = re.match(r'^(\s*[^#:]+:\s*).*$', line)
+                        match = self.INVENTORY_LINE.match(line)
                         if match:
                             return f"{match.group(1)}***REDACTED***\n", True
 
@@ -254,43 +316,176 @@ class PropertySanitizer:
 
         return self._sanitize_file_base(file_path, process_inventory_line, "variables", in_place)
 
+    def sanitize_file(self, file_path, file_type, in_place=True):
+        """
+        Sanitize a file with the sanitization method of its type.
+
+        Args:
+            file_path: Path to the file to sanitize
+            file_type: One of FILE_TYPES
+            in_place: If True, modify file in place; if False, return sanitized content
+        """
+        handlers = {
+            'properties': self.sanitize_properties_file,
+            'override': self.sanitize_override_file,
+            'inventory': self.sanitize_inventory_file,
+        }
+        return handlers[file_type](file_path, in_place=in_place)
+
+
+FILE_TYPES = ['properties', 'override', 'inventory']
+
+
+def detect_file_type(file_path):
+    """Infer the file type from its name, returns None when it cannot be inferred."""
+    file_path = Path(file_path)
+    if file_path.suffix == '.properties':
+        return 'properties'
+    if file_path.name == 'override.conf':
+        return 'override'
+    if file_path.suffix in ['.yml', '.yaml'] or 'inventory' in file_path.name.lower():
+        return 'inventory'
+    return None
+
+
+def collect_batch_files(paths, file_type=None, types=None):
+    """
+    Expand paths into (file, type) pairs for batch mode.
+
+    Directories are walked recursively and only keep files whose inferred type is in types,
+    file_type is never applied to them. Files given explicitly must have a type, either file_type
+    or an inferred one.
+
+    Returns:
+        Tuple of (list of (file, type), list of paths whose type cannot be inferred)
+    """
+    files = []
+    undetected = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    detected = detect_file_type(name)
+                    if detected and (not types or detected in types):
+                        files.append((os.path.join(root, name), detected))
+        else:
+            detected = file_type or detect_file_type(path)
+            if detected:
+                files.append((path, detected))
+            else:
+                undetected.append(path)
+    return files, undetected
+
+
+# Up to this many files, starting worker processes costs more than it saves
+SERIAL_BATCH_MAX_FILES = 16
+
+_batch_sanitizer = None
+
+
+def _sanitize_batch_file(job):
+    """Process pool worker, each process reuses one sanitizer and its verdict cache."""
+    global _batch_sanitizer
+    if _batch_sanitizer is None:
+        _batch_sanitizer = PropertySanitizer(verbose=False)
+    file_path, file_type = job
+    try:
+        return file_path, file_type, _batch_sanitizer.sanitize_file(file_path, file_type), None
+    except (OSError, UnicodeError) as e:
+        return file_path, file_type, None, str(e)
+
+
+def sanitize_batch(files, jobs=None):
+    """
+    Sanitize (file, type) pairs in place, with a process pool when there are many files.
+
+    Returns:
+        Summary dictionary with per-file redaction counts and errors
+    """
+    if len(files) <= SERIAL_BATCH_MAX_FILES or jobs == 1:
+        results = [_sanitize_batch_file(job) for job in files]
+    else:
+        workers = min(jobs or os.cpu_count() or 1, len(files))
+        # Several chunks per worker so a slow file does not leave the other workers idle
+        chunksize = max(1, len(files) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_sanitize_batch_file, files, chunksize=chunksize))
+
+    summary = {'files': {}, 'errors': {}, 'total_files': 0, 'total_sanitized': 0}
+    for file_path, file_type, sanitized_count, error in results:
+        if error is not None:
+            summary['errors'][file_path] = error
+        elif sanitized_count is None:
+            summary['errors'][file_path] = 'File not found'
+        else:
+            summary['files'][file_path] = {'type': file_type, 'sanitized': sanitized_count}
+            summary['total_files'] += 1
+            summary['total_sanitized'] += sanitized_count
+    return summary
+
 
 def main():
     parser = argparse.ArgumentParser(
         description='Sanitize Confluent Platform configuration files'
     )
-    parser.add_argument('file', help='File to sanitize')
-    parser.add_argument('--type', choices=['properties', 'override', 'inventory'],
-                        help='File type (auto-detected if not specified)')
+    parser.add_argument('files', nargs='+', metavar='file',
+                        help="File to sanitize, or '-' to read stdin and write stdout (requires --type). "
+                             "With --batch, any number of files and directories")
+    parser.add_argument('--type', choices=FILE_TYPES,
+                        help='File type (auto-detected if not specified). '
+                             'In batch mode, only applies to the files given explicitly')
     parser.add_argument('--dry-run', action='store_true',
                         help='Print sanitized output without modifying file')
+    parser.add_argument('--batch', action='store_true',
+                        help='Sanitize all given files and directory trees in place with a process pool '
+                             'and print a JSON summary of per-file redaction counts')
+    parser.add_argument('--types', default=','.join(FILE_TYPES),
+                        help='Comma separated file types sanitized when walking directories in batch mode '
+                             '(default: %(default)s)')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Number of batch worker processes (default: number of CPUs, '
+                             f'files are sanitized serially up to {SERIAL_BATCH_MAX_FILES} files)')
 
     args = parser.parse_args()
 
+    if args.batch:
+        if args.dry_run or '-' in args.files:
+            print("Error: --batch cannot be combined with --dry-run or stdin", file=sys.stderr)
+            sys.exit(1)
+        types = [file_type.strip() for file_type in args.types.split(',') if file_type.strip()]
+        unknown_types = sorted(set(types) - set(FILE_TYPES))
+        if unknown_types:
+            print(f"Error: Unknown file types: {', '.join(unknown_types)}", file=sys.stderr)
+            sys.exit(1)
+        files, undetected = collect_batch_files(args.files, args.type, types)
+        summary = sanitize_batch(files, args.jobs)
+        for file_path in undetected:
+            summary['errors'][file_path] = 'Cannot auto-detect file type'
+        print(json.dumps(summary, indent=2, sort_keys=True))
+        sys.exit(1 if summary['errors'] else 0)
+
+    if len(args.files) > 1:
+        print("Error: Multiple files require --batch", file=sys.stderr)
+        sys.exit(1)
+
     # Auto-detect file type if not specified
-    file_path = Path(args.file)
+    file_name = args.files[0]
     file_type = args.type
 
     if not file_type:
-        if file_path.suffix == '.properties':
-            file_type = 'properties'
-        elif file_path.name == 'override.conf':
-            file_type = 'override'
-        elif file_path.suffix in ['.yml', '.yaml'] or 'inventory' in file_path.name.lower():
-            file_type = 'inventory'
-        else:
-            print(f"Error: Cannot auto-detect file type for {args.file}", file=sys.stderr)
+        if file_name == '-':
+            print("Error: --type is required when reading from stdin", file=sys.stderr)
+            sys.exit(1)
+        file_type = detect_file_type(file_name)
+        if not file_type:
+            print(f"Error: Cannot auto-detect file type for {file_name}", file=sys.stderr)
             sys.exit(1)
 
     sanitizer = PropertySanitizer()
 
     # Dispatch to the appropriate sanitization method
-    handlers = {
-        'properties': sanitizer.sanitize_properties_file,
-        'override': sanitizer.sanitize_override_file,
-        'inventory': sanitizer.sanitize_inventory_file,
-    }
-    result = handlers[file_type](args.file, in_place=not args.dry_run)
+    result = sanitizer.sanitize_file(file_name, file_type, in_place=not args.dry_run)
 
     if args.dry_run and result:
         print(result)
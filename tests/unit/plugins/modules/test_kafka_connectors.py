@@ -0,0 +1,524 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from ansible.module_utils.six.moves import http_client
+import ansible.module_utils.six.moves.urllib.error as urllib_error
+from ansible_collections.confluent.platform.plugins.modules import kafka_connectors
+
+
+CONNECT_URL = 'http://connect:8083/connectors'
+
+
+class FakeClock(object):
+    """Replaces time.monotonic and time.sleep, sleeping only advances the clock."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeSession(object):
+    """Stands in for ConnectSession, each request is answered by handler(method, url, data)."""
+
+    def __init__(self, handler, connect_url=CONNECT_URL):
+        self.connect_url = connect_url
+        self.metrics = kafka_connectors.ConnectMetrics()
+        self.handler = handler
+        self.calls = []
+
+    def request(self, url, method='GET', data=None, headers=None):
+        self.calls.append((method, url))
+        code, body = self.handler(method, url, data)
+        return kafka_connectors.ConnectResponse(code, 'OK', json.dumps(body).encode('utf-8'))
+
+    def close(self):
+        pass
+
+
+class FakeConnect(object):
+    """Minimal Connect REST API keeping connector configs in memory, usable as a FakeSession handler."""
+
+    def __init__(self, connectors=None, states=None, expand=True):
+        self.connectors = dict((name, dict(config, name=name)) for name, config in (connectors or {}).items())
+        self.states = dict(states or {})
+        self.expand = expand
+
+    def __call__(self, method, url, data):
+        path = url.split('/connectors', 1)[1].split('?')[0]
+        parts = [part for part in path.split('/') if part]
+
+        if not parts:
+            if method == 'POST':
+                connector = json.loads(data)
+                self.connectors[connector['name']] = dict(connector['config'], name=connector['name'])
+                return 201, connector
+            if not self.expand:
+                return 200, sorted(self.connectors)
+            return 200, dict(
+                (name, {'info': {'name': name, 'config': config}, 'status': self.status(name)})
+                for name, config in self.connectors.items()
+            )
+
+        name = parts[0]
+        if len(parts) == 1 and method == 'DELETE':
+            del self.connectors[name]
+            return 204, None
+        if parts[1] == 'config' and method == 'PUT':
+            self.connectors[name] = json.loads(data)
+            return 200, {'name': name, 'config': self.connectors[name]}
+        if parts[1] == 'config':
+            return 200, self.connectors[name]
+        if parts[1] == 'restart':
+            return 202, self.status(name)
+        return 200, self.status(name)
+
+    def status(self, name):
+        state = self.states.get(name, 'RUNNING')
+        return connector_status(state, state)
+
+
+def unreachable(method, url, data):
+    raise urllib_error.URLError('[Errno 111] Connection refused')
+
+
+def calls_of(session, method):
+    return [url for call_method, url in session.calls if call_method == method]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = FakeClock()
+    monkeypatch.setattr(kafka_connectors.time, 'monotonic', fake_clock.monotonic)
+    monkeypatch.setattr(kafka_connectors.time, 'sleep', fake_clock.sleep)
+    # no jitter: each backoff is its upper bound
+    monkeypatch.setattr(kafka_connectors.random, 'uniform', lambda low, high: high)
+    return fake_clock
+
+
+def connector_status(connector_state, *task_states):
+    return {
+        'name': 'test-sink',
+        'connector': {'state': connector_state, 'worker_id': 'connect-1:8083'},
+        'tasks': [{'id': task_id, 'state': state, 'worker_id': 'connect-1:8083'} for task_id, state in enumerate(task_states)]
+    }
+
+
+def status_sequence(*statuses):
+    remaining = list(statuses)
+
+    def handler(method, url, data):
+        # the last status is returned for every later poll
+        return 200, remaining.pop(0) if len(remaining) > 1 else remaining[0]
+    return handler
+
+
+def test_status_wait_backs_off_until_running(clock):
+    session = FakeSession(status_sequence(
+        connector_status('RUNNING', 'UNASSIGNED'),
+        connector_status('RUNNING', 'UNASSIGNED'),
+        connector_status('RUNNING', 'RUNNING'),
+    ))
+
+    assert kafka_connectors.wait_for_connector_status(session, 'test-sink', 2, 8, 40) == (True, None)
+    assert clock.sleeps == [2, 0.5, 1.0]
+    assert session.metrics.counters['status_polls'] == 3
+
+
+def test_status_wait_backoff_is_capped_and_stops_at_the_deadline(clock):
+    session = FakeSession(status_sequence(connector_status('RUNNING', 'UNASSIGNED')))
+
+    is_running, message = kafka_connectors.wait_for_connector_status(session, 'test-sink', 2, 4, 20)
+
+    assert not is_running
+    assert message.startswith('task 0: ')
+    assert max(clock.sleeps[1:]) == 4
+    # the last sleep is shortened so that the final poll happens at the deadline
+    assert clock.now == 2 + 20
+
+
+def test_status_wait_reports_a_connector_not_running_at_the_deadline(clock):
+    session = FakeSession(status_sequence(connector_status('PAUSED', 'PAUSED')))
+
+    assert kafka_connectors.wait_for_connector_status(session, 'test-sink', 2, 8, 10) == \
+        (False, "Connector state paused or failed")
+
+
+def test_status_wait_ignores_the_running_state_from_before_a_pending_restart(clock):
+    session = FakeSession(status_sequence(
+        connector_status('RUNNING', 'RUNNING'),
+        connector_status('RUNNING', 'RESTARTING'),
+        connector_status('RUNNING', 'RUNNING'),
+    ))
+
+    assert kafka_connectors.wait_for_connector_status(session, 'test-sink', 2, 8, 40, restart_pending=True) == (True, None)
+    assert session.metrics.counters['status_polls'] == 3
+
+
+def test_status_wait_trusts_running_after_the_restart_grace_period(clock):
+    session = FakeSession(status_sequence(connector_status('RUNNING', 'RUNNING')))
+
+    assert kafka_connectors.wait_for_connector_status(session, 'test-sink', 2, 8, 40, restart_pending=True) == (True, None)
+    assert clock.now >= 2 + 8
+    assert clock.now < 40
+
+
+def test_plan_connectors():
+    current_connectors = {
+        'kept-sink': {'config': {'name': 'kept-sink', 'tasks.max': '1'}, 'state': 'RUNNING'},
+        'changed-sink': {'config': {'name': 'changed-sink', 'tasks.max': '1', 'db.password': 'old'}, 'state': 'RUNNING'},
+        'removed-sink': {'config': {'name': 'removed-sink'}, 'state': 'RUNNING'},
+    }
+    active_connectors = [
+        {'name': 'kept-sink', 'config': {'tasks.max': '1'}},
+        {'name': 'changed-sink', 'config': {'tasks.max': '2', 'db.password': 'new'}},
+        {'name': 'new-sink', 'config': {'tasks.max': '1'}},
+    ]
+    session = FakeSession(FakeConnect())
+
+    plan = kafka_connectors.plan_connectors(session, active_connectors, current_connectors)
+
+    assert plan['create'] == ['new-sink']
+    assert plan['update'] == ['changed-sink']
+    assert plan['delete'] == ['removed-sink']
+    assert plan['unchanged'] == ['kept-sink']
+    assert plan['config_diffs'] == {'changed-sink': {
+        'tasks.max': {'before': '1', 'after': '2'},
+        'db.password': {'before': kafka_connectors.MASKED_CONFIG_VALUE, 'after': kafka_connectors.MASKED_CONFIG_VALUE},
+    }}
+    assert session.calls == []
+
+
+def test_plan_connectors_fetches_configs_missing_from_the_snapshot():
+    session = FakeSession(FakeConnect({'test-sink': {'tasks.max': '1'}}, expand=False))
+    current_connectors = kafka_connectors.get_current_connectors(session)
+
+    plan = kafka_connectors.plan_connectors(session, [{'name': 'test-sink', 'config': {'tasks.max': '2'}}], current_connectors)
+
+    assert plan['update'] == ['test-sink']
+    assert calls_of(session, 'GET') == [CONNECT_URL + '?' + kafka_connectors.CONNECTORS_EXPAND_QUERY, CONNECT_URL + '/test-sink/config']
+
+
+def test_plan_connectors_skips_connectors_with_a_matching_fingerprint():
+    session = FakeSession(FakeConnect({'test-sink': {'tasks.max': '1'}}, expand=False))
+    current_connectors = kafka_connectors.get_current_connectors(session)
+    active_connectors = [{'name': 'test-sink', 'config': {'tasks.max': '2'}}]
+    fingerprints = {'test-sink': kafka_connectors.get_config_fingerprint('test-sink', {'tasks.max': '2'})}
+
+    plan = kafka_connectors.plan_connectors(session, active_connectors, current_connectors, fingerprints)
+
+    assert plan['unchanged'] == ['test-sink']
+    assert plan['config_diffs'] == {}
+    # the live configuration is not fetched
+    assert calls_of(session, 'GET') == [CONNECT_URL + '?' + kafka_connectors.CONNECTORS_EXPAND_QUERY]
+
+
+def test_save_fingerprints_merges_with_the_file_content(tmp_path):
+    fingerprint_file = str(tmp_path / 'state' / 'fingerprints.json')
+
+    kafka_connectors.save_fingerprints(fingerprint_file, {'http://connect-a:8083/connectors': {'a-sink': '1'}})
+    kafka_connectors.save_fingerprints(fingerprint_file, {'http://connect-b:8083/connectors': {'b-sink': '2'}})
+
+    assert kafka_connectors.load_fingerprints(fingerprint_file) == {
+        'http://connect-a:8083/connectors': {'a-sink': '1'},
+        'http://connect-b:8083/connectors': {'b-sink': '2'},
+    }
+
+
+class UpdateRecorder(object):
+    """Replaces update_existing_connector and wait_for_group_settled, recording the order of the calls."""
+
+    def __init__(self, monkeypatch, settled=True):
+        self.events = []
+        self.settled = settled
+        monkeypatch.setattr(kafka_connectors, 'update_existing_connector', self.update)
+        monkeypatch.setattr(kafka_connectors, 'wait_for_group_settled', self.wait_for_group_settled)
+
+    def update(self, session, name, config, status_wait=None, only_failed=False, paused=False):
+        self.events.append(name)
+        return True, True, "connector configuration updated"
+
+    def wait_for_group_settled(self, session, max_backoff, deadline):
+        self.events.append('settle')
+        return self.settled
+
+    def waves(self):
+        waves = [[]]
+        for event in self.events:
+            if event == 'settle':
+                waves.append([])
+            else:
+                waves[-1].append(event)
+        return [sorted(wave) for wave in waves]
+
+
+STATUS_WAIT = dict(initial_delay=2, max_backoff=8, deadline=40)
+
+
+def test_schedule_updates_waits_for_the_group_between_waves(monkeypatch):
+    recorder = UpdateRecorder(monkeypatch)
+    connectors = [{'name': name, 'config': {}} for name in ('a', 'b', 'c', 'd', 'e')]
+
+    results = kafka_connectors.schedule_updates(FakeSession(FakeConnect()), connectors, 2, STATUS_WAIT)
+
+    assert recorder.waves() == [['a', 'b'], ['c', 'd'], ['e']]
+    assert all(results[name] == (True, True, "connector configuration updated") for name in 'abcde')
+
+
+def test_schedule_updates_stops_when_the_group_does_not_settle(monkeypatch):
+    recorder = UpdateRecorder(monkeypatch, settled=False)
+    connectors = [{'name': name, 'config': {}} for name in ('a', 'b', 'c', 'd', 'e')]
+
+    results = kafka_connectors.schedule_updates(FakeSession(FakeConnect()), connectors, 2, STATUS_WAIT)
+
+    assert recorder.waves() == [['a', 'b'], []]
+    assert results['a'] == (True, True, "connector configuration updated")
+    for name in ('c', 'd', 'e'):
+        success, changed, message = results[name]
+        assert not success and not changed
+        assert 'did not settle within 40s' in message
+
+
+def test_group_settle_poll_treats_request_errors_as_not_settled(clock):
+    responses = [
+        urllib_error.URLError('timed out'),
+        urllib_error.HTTPError(CONNECT_URL, 503, 'Service Unavailable', {}, None),
+        {'test-sink': {'status': connector_status('RUNNING', 'UNASSIGNED')}},
+        {'test-sink': {'status': connector_status('RUNNING', 'RUNNING')}},
+    ]
+
+    def handler(method, url, data):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return 200, response
+
+    assert kafka_connectors.poll_group_settled(FakeSession(handler), 8, 40)
+    assert responses == []
+
+
+def test_group_settle_poll_times_out(clock):
+    session = FakeSession(unreachable)
+
+    assert not kafka_connectors.poll_group_settled(session, 8, 40)
+    assert clock.now == 40
+
+
+def test_update_does_not_restart_a_paused_connector(clock):
+    session = FakeSession(FakeConnect({'test-sink': {'tasks.max': '1'}}, states={'test-sink': 'PAUSED'}))
+
+    result = kafka_connectors.update_existing_connector(session, 'test-sink', {'tasks.max': '2'}, STATUS_WAIT, paused=True)
+
+    assert result == (True, True, "connector configuration updated, connector is paused")
+    assert session.calls == [('PUT', CONNECT_URL + '/test-sink/config')]
+
+
+RECONCILE_PARAMS = dict(
+    max_parallel=2,
+    restart_batch_size=None,
+    restart_only_failed=False,
+    status_initial_delay=2,
+    status_max_backoff=8,
+    status_deadline=40,
+)
+
+
+def test_reconcile_in_check_mode_plans_an_unreachable_cluster_as_empty():
+    active_connectors = [{'name': 'test-sink', 'config': {'tasks.max': '1'}}]
+
+    cluster_result = kafka_connectors.reconcile_cluster(FakeSession(unreachable), active_connectors, RECONCILE_PARAMS, True)
+
+    assert not cluster_result['failed']
+    assert cluster_result['changed']
+    assert cluster_result['plan']['create'] == ['test-sink']
+    assert len(cluster_result['warnings']) == 1
+    assert 'unreachable' in cluster_result['warnings'][0]
+
+
+def test_reconcile_fails_on_an_unreachable_cluster():
+    active_connectors = [{'name': 'test-sink', 'config': {'tasks.max': '1'}}]
+
+    cluster_result = kafka_connectors.reconcile_cluster(FakeSession(unreachable), active_connectors, RECONCILE_PARAMS, False)
+
+    assert cluster_result['failed']
+    assert 'plan' not in cluster_result
+    assert cluster_result['warnings'] == []
+
+
+def test_reconcile_creates_updates_and_deletes(clock):
+    connect = FakeConnect({'changed-sink': {'tasks.max': '1'}, 'removed-sink': {}})
+    session = FakeSession(connect)
+    active_connectors = [
+        {'name': 'changed-sink', 'config': {'tasks.max': '2'}},
+        {'name': 'new-sink', 'config': {'tasks.max': '1'}},
+    ]
+
+    cluster_result = kafka_connectors.reconcile_cluster(session, active_connectors, RECONCILE_PARAMS, False)
+
+    assert not cluster_result['failed']
+    assert cluster_result['changed']
+    assert sorted(connect.connectors) == ['changed-sink', 'new-sink']
+    assert connect.connectors['changed-sink']['tasks.max'] == '2'
+    assert sorted(cluster_result['fingerprints']) == ['changed-sink', 'new-sink']
+
+
+class AnsibleExitJson(Exception):
+    pass
+
+
+class AnsibleFailJson(Exception):
+    pass
+
+
+@pytest.fixture
+def run_module(monkeypatch):
+    """Runs the module with a fake AnsibleModule, sessions are answered by the handlers keyed by connect_url."""
+
+    def run(args, handlers, check_mode=False):
+        class FakeAnsibleModule(object):
+            def __init__(self, argument_spec, **kwargs):
+                self.params = dict((name, spec.get('default')) for name, spec in argument_spec.items())
+                self.params.update(args)
+                self.check_mode = check_mode
+                self.warnings = []
+
+            def warn(self, warning):
+                self.warnings.append(warning)
+
+            def exit_json(self, **result):
+                raise AnsibleExitJson(result)
+
+            def fail_json(self, **result):
+                raise AnsibleFailJson(result)
+
+        monkeypatch.setattr(kafka_connectors, 'AnsibleModule', FakeAnsibleModule)
+        monkeypatch.setattr(kafka_connectors, 'ConnectSession',
+                            lambda connect_url, **kwargs: FakeSession(handlers[connect_url], connect_url))
+        kafka_connectors.run_module()
+
+    return run
+
+
+def test_run_module_fails_when_a_single_cluster_fails(clock, run_module):
+    healthy_url = 'http://connect-a:8083/connectors'
+    unreachable_url = 'http://connect-b:8083/connectors'
+    healthy_connect = FakeConnect()
+    targets = [
+        dict(connect_url=healthy_url, active_connectors=[{'name': 'a-sink', 'config': {'tasks.max': '1'}}]),
+        dict(connect_url=unreachable_url, active_connectors=[{'name': 'b-sink', 'config': {'tasks.max': '1'}}]),
+    ]
+
+    with pytest.raises(AnsibleFailJson) as e:
+        run_module(dict(targets=targets), {healthy_url: healthy_connect, unreachable_url: unreachable})
+
+    result = e.value.args[0]
+    assert [cluster['failed'] for cluster in result['clusters']] == [False, True]
+    assert result['changed']
+    assert sorted(healthy_connect.connectors) == ['a-sink']
+
+
+def test_run_module_skips_connectors_deployed_by_the_previous_run(clock, run_module, tmp_path):
+    connect = FakeConnect()
+    args = dict(
+        connect_url=CONNECT_URL,
+        active_connectors=[{'name': 'test-sink', 'config': {'tasks.max': '1'}}],
+        fingerprint_file=str(tmp_path / 'fingerprints.json'),
+    )
+
+    with pytest.raises(AnsibleExitJson) as first_run:
+        run_module(args, {CONNECT_URL: connect})
+    with pytest.raises(AnsibleExitJson) as second_run:
+        run_module(args, {CONNECT_URL: connect})
+
+    assert first_run.value.args[0]['changed']
+    assert not second_run.value.args[0]['changed']
+    assert second_run.value.args[0]['plan']['unchanged'] == ['test-sink']
+
+
+class FakeHTTPResponse(object):
+    status = 200
+    reason = 'OK'
+    msg = {}
+    will_close = False
+
+    def read(self):
+        return b'{}'
+
+
+class FakeConnection(object):
+    """http_client connection that fails on the first request or response when told to."""
+
+    def __init__(self, fail_on=None, sock=None):
+        self.fail_on = fail_on
+        self.sock = sock
+        self.requests = []
+
+    def request(self, method, path, body=None, headers=None):
+        self.requests.append(method)
+        if self.fail_on == 'request':
+            raise ConnectionResetError(104, 'Connection reset by peer')
+        self.sock = object()
+
+    def getresponse(self):
+        if self.fail_on == 'response':
+            raise http_client.RemoteDisconnected('Remote end closed connection without response')
+        return FakeHTTPResponse()
+
+    def close(self):
+        self.sock = None
+
+
+@pytest.fixture
+def connect_session(monkeypatch):
+    """ConnectSession whose current keep-alive connection is given, new connections never fail."""
+    new_connections = []
+
+    def new_connection(*args, **kwargs):
+        new_connections.append(FakeConnection())
+        return new_connections[-1]
+
+    def create(stale_connection):
+        monkeypatch.setattr(kafka_connectors.http_client, 'HTTPConnection', new_connection)
+        monkeypatch.setattr(kafka_connectors, 'is_connection_dropped', lambda sock: False)
+        session = kafka_connectors.ConnectSession(CONNECT_URL, 5, '', None, None)
+        session.use_open_url = False
+        session._local.connection = stale_connection
+        return session, new_connections
+
+    return create
+
+
+def test_request_resends_a_get_after_a_connection_reset(connect_session):
+    session, new_connections = connect_session(FakeConnection('response', sock=object()))
+
+    assert session.request(CONNECT_URL).getcode() == 200
+    assert len(new_connections) == 1
+    assert session.metrics.counters['http_retries'] == 1
+
+
+def test_request_does_not_resend_a_post_that_may_have_been_received(connect_session):
+    stale_connection = FakeConnection('response', sock=object())
+    session, new_connections = connect_session(stale_connection)
+
+    with pytest.raises(http_client.RemoteDisconnected):
+        session.request(CONNECT_URL, method='POST', data='{}')
+    assert stale_connection.requests == ['POST']
+    assert new_connections == []
+
+
+def test_request_resends_a_post_that_could_not_be_sent(connect_session):
+    session, new_connections = connect_session(FakeConnection('request', sock=object()))
+
+    assert session.request(CONNECT_URL, method='POST', data='{}').getcode() == 200
+    assert new_connections[0].requests == ['POST']
+    assert session.metrics.counters['http_retries'] == 1
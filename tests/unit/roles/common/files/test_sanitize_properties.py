@@ -0,0 +1,80 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import os
+import subprocess
+import sys
+
+SANITIZE_PROPERTIES = os.path.join(
+    os.path.dirname(__file__), '..', '..', '..', '..', '..', 'roles', 'common', 'files', 'sanitize_properties.py')
+
+SERVER_PROPERTIES = (
+    "listeners=SSL://:9092\n"
+    "ssl.keystore.location=/var/ssl/private/kafka.keystore.jks\n"
+    "ssl.keystore.password=changeme\n"
+)
+
+OVERRIDE_CONF = (
+    "[Service]\n"
+    "Environment=\"KAFKA_HEAP_OPTS=-Xmx1g\"\n"
+    "Environment=\"CONFLUENT_SECURITY_MASTER_KEY=abc\"\n"
+)
+
+
+def run_sanitizer(*args, **kwargs):
+    return subprocess.run([sys.executable, SANITIZE_PROPERTIES] + list(args),
+                          capture_output=True, text=True, **kwargs)
+
+
+def test_batch_mode_infers_the_type_of_each_file_found_in_directories(tmp_path):
+    configs = tmp_path / 'kafka_broker' / 'broker-1' / 'configs'
+    configs.mkdir(parents=True)
+    (configs / 'server.properties').write_text(SERVER_PROPERTIES)
+    (configs / 'override.conf').write_text(OVERRIDE_CONF)
+    explicit_file = tmp_path / 'connect-env'
+    explicit_file.write_text(OVERRIDE_CONF)
+
+    result = run_sanitizer('--batch', str(tmp_path / 'kafka_broker'), str(explicit_file), '--type', 'override')
+
+    assert result.returncode == 0, result.stderr
+    summary = json.loads(result.stdout)
+    assert summary['errors'] == {}
+    assert summary['files'] == {
+        str(configs / 'override.conf'): {'type': 'override', 'sanitized': 1},
+        str(configs / 'server.properties'): {'type': 'properties', 'sanitized': 1},
+        str(explicit_file): {'type': 'override', 'sanitized': 1},
+    }
+    assert 'ssl.keystore.password=***REDACTED***' in (configs / 'server.properties').read_text()
+    assert 'ssl.keystore.location=/var/ssl/private/kafka.keystore.jks' in (configs / 'server.properties').read_text()
+    assert 'CONFLUENT_SECURITY_MASTER_KEY=abc' not in explicit_file.read_text()
+
+
+def test_batch_mode_only_walks_the_requested_types(tmp_path):
+    (tmp_path / 'server.properties').write_text(SERVER_PROPERTIES)
+    (tmp_path / 'override.conf').write_text(OVERRIDE_CONF)
+
+    result = run_sanitizer('--batch', str(tmp_path), '--types', 'override')
+
+    assert result.returncode == 0, result.stderr
+    assert list(json.loads(result.stdout)['files']) == [str(tmp_path / 'override.conf')]
+    assert (tmp_path / 'server.properties').read_text() == SERVER_PROPERTIES
+
+
+def test_stdin_is_sanitized_to_stdout():
+    result = run_sanitizer('-', '--type', 'properties', input=SERVER_PROPERTIES)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines() == [
+        "# THIS FILE HAS BEEN SANITIZED - SENSITIVE VALUES REDACTED",
+        "listeners=SSL://:9092",
+        "ssl.keystore.location=/var/ssl/private/kafka.keystore.jks",
+        "ssl.keystore.password=***REDACTED***",
+    ]
+
+
+def test_stdin_requires_a_type():
+    result = run_sanitizer('-', input=SERVER_PROPERTIES)
+
+    assert result.returncode == 1
+    assert '--type is required' in result.stderr